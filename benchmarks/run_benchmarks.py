@@ -0,0 +1,248 @@
+"""Benchmarks of the design generation and analysis hot paths, across design sizes.
+
+Each benchmark is timed (best of repeated runs, as timeit) and its peak memory, as allocated by Python and NumPy,
+is measured with tracemalloc, for increasing numbers of factors. The scaling exponent of a benchmark is the slope
+of log(time) against log(size) over its larger sizes, e.g., about 2 for a cost growing as nf^2.
+The results can be saved as JSON and compared with those of another commit, on the same machine.
+
+Usage, from the root of the repository:
+
+    python benchmarks/run_benchmarks.py --output base.json         # on the reference commit
+    python benchmarks/run_benchmarks.py --compare base.json        # exit code 1 if some benchmark got slower
+    python benchmarks/run_benchmarks.py --quick --filter generate  # smaller sizes, only the matching benchmarks
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # benchmark this checkout
+
+from definitive_screening_design import _generalized_dsd  # noqa: E402
+from definitive_screening_design._generalized_dsd import (  # noqa: E402
+    _compute_dsd,
+    clear_design_cache,
+    get_paley_matrix,
+    isprime,
+    next_prime,
+)
+from definitive_screening_design.analysis import (  # noqa: E402
+    get_efficiency,
+    get_map_of_correlations,
+    get_variance,
+    get_X,
+)
+from definitive_screening_design.design import generate  # noqa: E402
+
+# Effect sets of the analysis benchmarks, with the largest number of factors each is run for
+EFFECT_SETS = {
+    "main": (("intercept", "main"), 500),
+    "quadratic": (("intercept", "main", "quadratic"), 500),
+    "2-interactions": (("intercept", "main", "2-interactions"), 100),
+    "full-quadratic": (("intercept", "main", "2-interactions", "quadratic"), 100),
+    "3-interactions": (("intercept", "main", "2-interactions", "3-interactions", "quadratic"), 30),
+}
+SIZES = [3, 5, 10, 20, 50, 100, 200, 500]
+QUICK_SIZES = [3, 10, 30, 100]
+
+
+def _bench_compute_dsd(nf):
+    def run():
+        clear_design_cache()
+        _compute_dsd(nf, 0, "dsd")
+
+    return run
+
+
+def _bench_paley(nf):
+    q = next_prime(nf)
+    return lambda: get_paley_matrix(q)
+
+
+def _bench_isprime(n):
+    def run():
+        _generalized_dsd._sieve = np.zeros(0, dtype=bool)  # grow the sieve from scratch
+        for p in range(n):
+            isprime(p)
+
+    return run
+
+
+def _bench_generate(n_cat_fraction):
+    def make(nf):
+        n_cat = int(nf * n_cat_fraction)
+
+        def run():
+            clear_design_cache()
+            generate(n_num=nf - n_cat, n_cat=n_cat, verbose=False)
+
+        return run
+
+    return make
+
+
+def _design(nf):
+    return generate(n_num=nf, verbose=False, output="coded").astype(float)
+
+
+def _bench_analysis(function, effects):
+    def make(nf):
+        A = _design(nf)
+        if function == "get_X":
+            return lambda: get_X(A, effects=effects)
+        if function == "get_efficiency":
+            return lambda: get_efficiency(A, effects=effects)
+        if function == "get_variance":
+            x = np.random.default_rng(0).uniform(-1.0, 1.0, size=(nf, 1000))
+            try:
+                get_variance(x[:, :1], A, effects=effects)
+            except np.linalg.LinAlgError:  # the model is not estimable on this design
+                return None
+            return lambda: get_variance(x, A, effects=effects)
+        return lambda: get_map_of_correlations(A, effects=effects, plot=False)
+
+    return make
+
+
+def get_benchmarks(quick=False):
+    """Return the list of (name, sizes, make), where make(size) returns the function to benchmark, or None."""
+    sizes = QUICK_SIZES if quick else SIZES
+    benchmarks = [
+        ("_compute_dsd", sizes, _bench_compute_dsd),
+        ("get_paley_matrix", sizes, _bench_paley),
+        ("isprime", [10**3, 10**4, 10**5] if quick else [10**3, 10**4, 10**5, 10**6], _bench_isprime),
+        ("generate", sizes, _bench_generate(0.0)),
+        ("generate[categorical]", sizes, _bench_generate(0.25)),
+    ]
+    for function in ["get_X", "get_efficiency", "get_variance", "get_map_of_correlations"]:
+        for effects_nm, (effects, max_size) in EFFECT_SETS.items():
+            effect_sizes = [size for size in sizes if size <= max_size]
+            benchmarks.append((f"{function}[{effects_nm}]", effect_sizes, _bench_analysis(function, effects)))
+    return benchmarks
+
+
+def measure(func, min_time=0.2, max_repeat=100):
+    """Return the best time of repeated runs of func (at least 3, until min_time) and its peak memory in bytes."""
+    func()  # warm up imports and caches that are not under test
+    times = []
+    start = time.perf_counter()
+    while len(times) < 3 or (len(times) < max_repeat and time.perf_counter() - start < min_time):
+        tic = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - tic)
+
+    tracemalloc.start()
+    try:
+        func()
+        peak_memory = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return min(times), peak_memory
+
+
+def get_scaling_exponent(sizes, times):
+    """Slope of log(time) against log(size) over the larger half of the sizes (nan if less than 2)."""
+    sizes, times = np.asarray(sizes, dtype=float), np.asarray(times, dtype=float)
+    larger = sizes >= np.median(sizes)
+    if larger.sum() < 2:
+        return float("nan")
+    return float(np.polyfit(np.log(sizes[larger]), np.log(times[larger]), 1)[0])
+
+
+def _get_metadata():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+
+def run(quick=False, pattern=None, min_time=0.2):
+    """Run the benchmarks whose name contains pattern, printing each result, and return all of them."""
+    results, exponents = [], {}
+    for name, sizes, make in get_benchmarks(quick):
+        if pattern and pattern not in name:
+            continue
+        measured_sizes, measured_times = [], []
+        for size in sizes:
+            func = make(size)
+            if func is None:
+                continue
+            best_time, peak_memory = measure(func, min_time=min_time)
+            results.append({"benchmark": name, "size": size, "time": best_time, "peak_memory": peak_memory})
+            measured_sizes.append(size)
+            measured_times.append(best_time)
+            print(f"{name:42s} {size:>8d} {best_time * 1e3:12.3f} ms {peak_memory / 2**20:10.2f} MB", flush=True)
+        if measured_sizes:
+            exponents[name] = get_scaling_exponent(measured_sizes, measured_times)
+    return {"metadata": _get_metadata(), "results": results, "exponents": exponents}
+
+
+def compare(new, old, tolerance=0.25, min_time=1e-3):
+    """Print the ratios of new to old times and peak memories, returning the results slower or larger by more than
+    tolerance (times below min_time are ignored, being too noisy)."""
+    old_results = {(result["benchmark"], result["size"]): result for result in old["results"]}
+    regressions = []
+    print(f"\nCompared with {old['metadata'].get('commit')} ({old['metadata'].get('date')}):")
+    for result in new["results"]:
+        reference = old_results.get((result["benchmark"], result["size"]))
+        if reference is None:
+            continue
+        time_ratio = result["time"] / reference["time"]
+        memory_ratio = result["peak_memory"] / max(reference["peak_memory"], 1)
+        slower = time_ratio > 1.0 + tolerance and result["time"] > min_time
+        larger = memory_ratio > 1.0 + tolerance and result["peak_memory"] > 2**20
+        flag = " <-- REGRESSION" if slower or larger else ""
+        print(
+            f"{result['benchmark']:42s} {result['size']:>8d} time x{time_ratio:6.2f} memory x{memory_ratio:6.2f}{flag}"
+        )
+        if flag:
+            regressions.append(result)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quick", action="store_true", help="run smaller sizes")
+    parser.add_argument("--filter", default=None, help="run only the benchmarks whose name contains this")
+    parser.add_argument("--min-time", type=float, default=0.2, help="minimum time spent timing each case (s)")
+    parser.add_argument("--output", default=None, help="save the results to this JSON file")
+    parser.add_argument("--compare", default=None, help="compare with the results saved in this JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="relative slowdown reported as regression")
+    args = parser.parse_args(argv)
+
+    results = run(quick=args.quick, pattern=args.filter, min_time=args.min_time)
+    print("\nScaling exponents (time ~ size^k):")
+    for name, exponent in results["exponents"].items():
+        print(f"{name:42s} k = {exponent:5.2f}")
+
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(results, fh, indent=1)
+    if args.compare:
+        with open(args.compare) as fh:
+            regressions = compare(results, json.load(fh), tolerance=args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regressions")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,26 @@
 """Definitive Design Screening"""
 
-from .design import generate
+from .design import generate, generate_batch, get_n_runs, clear_design_cache, design_cache_info, set_design_cache_size
 from .analysis import get_map_of_correlations
+from .augmentation import augment
+from .response import fit_definitive_screening, simulate_power
+from .instrumentation import instrument
+from .runsheet import RunSheet, load_run_sheet
 
 __version__ = "0.5.1"
 
-__all__ = ["generate", "get_map_of_correlations"]
+__all__ = [
+    "generate",
+    "generate_batch",
+    "get_n_runs",
+    "clear_design_cache",
+    "design_cache_info",
+    "set_design_cache_size",
+    "get_map_of_correlations",
+    "augment",
+    "fit_definitive_screening",
+    "simulate_power",
+    "instrument",
+    "RunSheet",
+    "load_run_sheet",
+]
@@ -31,17 +31,116 @@ OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
 OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE
 """
 
+from functools import lru_cache
+
 import numpy as np
 
+from .instrumentation import cached_call, instrumented, stage
+
+DESIGN_CACHE_SIZE = 128  # Maximum number of coded designs kept in memory by _compute_dsd
+# Version of the constructions of _build_dsd, stored in design catalogs: increase it whenever a change makes
+# _build_dsd return a different design for some nctn, ncat or designChoice, so that older catalogs are rejected
+CONSTRUCTION_VERSION = 2  # 2: conference matrices of prime power orders (e.g., 57 runs for nf=27)
+
+_sieve = np.zeros(0, dtype=bool)
+
+
+def _grow_sieve(n):
+    """Extend the cached sieve of Eratosthenes so that it covers all integers up to @n (at least doubling it)."""
+    global _sieve
+    if n < _sieve.size:
+        return _sieve
+    size = max(n + 1, 2 * _sieve.size, 1024)
+    sieve = np.ones(size, dtype=bool)
+    sieve[:2] = False
+    sieve[4::2] = False
+    for i in range(3, int(np.sqrt(size - 1)) + 1, 2):
+        if sieve[i]:
+            sieve[i * i :: 2 * i] = False
+    _sieve = sieve
+    return _sieve
+
 
 def isprime(p):
-    """this 'isprime' is a basic primality checker in a somewhat slow method; it works to replace sympy implementation;
-    we check for 1, 2 as prime, even numbers as not-prime, and then see if residue of number @p with divisors from (2 to ceil(p/2)+1) if they are non-zero to ensure primality"""
+    """Primality check backed by a sieve of Eratosthenes that is built lazily and grown on demand;
+    for compatibility with the original implementation, numbers lower than or equal to 2 are considered prime."""
     if p <= 2:
         return True
-    if p % 2 == 0:
-        return False
-    return all(np.mod(p, np.arange(2, p // 2 + 1)) != 0)
+    return bool(_grow_sieve(p)[p])
+
+
+def next_prime(p):
+    """Return the smallest number greater than or equal to @p which is prime according to isprime."""
+    if p <= 2:
+        return p
+    sieve = _grow_sieve(p)
+    while True:
+        candidates = np.flatnonzero(sieve[p:])
+        if candidates.size > 0:
+            return int(p + candidates[0])
+        sieve = _grow_sieve(sieve.size)
+
+
+def get_prime_power(q):
+    """Return (p, k) such that @q = p**k with p prime, or None if @q is not a prime power."""
+    if q < 2:
+        return None
+    if isprime(q):
+        return q, 1
+    root = int(np.sqrt(q))
+    primes = np.flatnonzero(_grow_sieve(root)[: root + 1])
+    divisors = primes[np.remainder(q, primes) == 0]
+    if divisors.size != 1:
+        return None
+    p, k = int(divisors[0]), 0
+    while q % p == 0:
+        q, k = q // p, k + 1
+    return (p, k) if q == 1 else None
+
+
+def next_prime_power(p):
+    """Return the smallest number greater than or equal to the odd number @p which is an odd prime power
+    (or @p itself if lower than or equal to 2, as in isprime)."""
+    if p <= 2:
+        return p
+    while get_prime_power(p) is None:
+        p = p + 2
+    return p
+
+
+@lru_cache(maxsize=None)
+def get_galois_field(q):
+    """Return the tables of GF(q), q = p**k, used for the Paley construction, as a tuple (digits, character).
+
+    The elements are the integers 0 to q-1, whose base-p digits are the coefficients of the polynomial
+    representation: digits[e] is the array of the k digits of the element e, so that addition and subtraction
+    are digit-wise modulo p. The multiplicative group is generated by the root of the first primitive
+    polynomial found (in lexicographic order), hence character[e] is -1 for nonzero squares (even powers of
+    the generator), +1 for non-squares and 0 for e=0, i.e., the same convention of get_quadratic_character.
+    """
+    p, k = get_prime_power(q)
+    place = p ** np.arange(k)
+    digits = np.remainder(np.arange(q)[:, np.newaxis] // place, p)
+
+    for coefficients in np.ndindex(*([p] * k)):  # x^k + c_(k-1) x^(k-1) + ... + c_0
+        if coefficients[-1] == 0:
+            continue
+        coefficients = np.array(coefficients[::-1])
+        state = np.zeros(k, dtype=int)
+        state[0] = 1  # generator^0
+        powers = np.zeros(q - 1, dtype=int)
+        for i in range(q - 1):
+            powers[i] = state @ place
+            if i > 0 and powers[i] == 1:
+                break
+            state = np.remainder(np.append(0, state[:-1]) - state[-1] * coefficients, p)  # times the generator
+        else:
+            break
+
+    character = np.ones(q, dtype=int)
+    character[powers[0::2]] = -1
+    character[0] = 0
+    return digits, character
 
 
 def get_legendre(i, j, fld):
@@ -59,13 +158,29 @@ def get_legendre(i, j, fld):
     return legendre
 
 
+def get_quadratic_character(q):
+    """Return the sign assigned to each difference (0 to q-1) modulo the prime q.
+
+    The quadratic residues are computed once: a nonzero residue maps to -1, a non-residue to +1 and 0 to 0,
+    i.e., the same values returned by get_legendre for j - i in range(q).
+    """
+    residues = np.zeros(q, dtype=bool)
+    residues[np.remainder(np.arange(q) ** 2, q)] = True
+    character = np.where(residues, -1, 1)
+    character[0] = 0
+    return character
+
+
 def get_paley_matrix(q):
-    """Construct paley matrix given prime number."""
-    m = np.zeros((q, q))
-    fld = np.arange(0, (q - 1) + 1)
-    for jj in range(q):
-        for j in range(jj, q):
-            m[jj, j] = get_legendre(jj - 1, j - 1, fld)
+    """Construct paley matrix given prime number, or prime power using the arithmetic of GF(q).
+    The matrix is int8 (entries -1, 0, 1): cast it before matrix products, which overflow in int8 for q > 127."""
+    if not isprime(q):
+        if q % 2 == 0 or get_prime_power(q) is None:
+            raise ValueError(f"The order of the Paley matrix must be an odd prime power: {q}")
+        return _get_galois_paley_matrix(q)
+    character = get_quadratic_character(q)
+    idx = np.arange(q)
+    m = np.triu(character[np.remainder(idx[np.newaxis, :] - idx[:, np.newaxis], q)]).astype(np.int8)
 
     mt = np.transpose(m)
     if np.mod(q, 4) == np.remainder(3, 4):
@@ -79,6 +194,53 @@ def get_paley_matrix(q):
     return paley_matrix
 
 
+def _get_galois_paley_matrix(q):
+    """Paley matrix over GF(q), q = p**k: the entry (i, j) is the quadratic character of the element j - i."""
+    p, k = get_prime_power(q)
+    digits, character = get_galois_field(q)
+    difference = np.zeros((q, q), dtype=int)
+    for d in range(k):
+        difference += np.remainder(digits[np.newaxis, :, d] - digits[:, np.newaxis, d], p) * p**d
+    return character[difference].astype(np.int8)
+
+
+def get_construction(nf):
+    """Return the construction used by _compute_dsd for @nf total factors, as a tuple (name, order):
+    'paley' for a conference matrix of order q+1 from the Paley matrix of the odd prime power q (the returned
+    order is q), otherwise one of the hardcoded special cases 'f10', 'f16' or 'circulant13' (two-circulant of
+    order 26)."""
+    if nf in (9, 10):
+        return "f10", 10
+    if nf in (15, 16):
+        return "f16", 16
+    if nf in (25, 26):
+        return "circulant13", 26
+    if 2 * int(np.floor(nf / 2)) == nf:  # nf is even
+        p = nf - 1
+    else:  # nf is odd
+        p = nf
+    return "paley", next_prime_power(p)
+
+
+def _get_n_centers(ncat, designChoice):
+    """Number of center runs added at the end of the design."""
+    if ncat == 0:
+        return 1
+    if ncat == 1 or designChoice == "dsd":
+        return 2
+    return 4
+
+
+def get_n_runs(nctn, ncat=0, designChoice="dsd"):
+    """Return the number of runs of _compute_dsd(nctn, ncat, designChoice) without building the design."""
+    if designChoice not in ["dsd", "orth"]:
+        raise Exception("Design Choice must be 'dsd' or 'orth'")
+    construction, order = get_construction(nctn + ncat)
+    if construction == "paley":
+        order = order + 1
+    return 2 * order + _get_n_centers(ncat, designChoice)
+
+
 def _compute_dsd(nctn, ncat=0, designChoice="dsd"):
     """DSD calculates definitive screening design conditions given an number
     of continuous (nctn) and categorical (ncat) factors, based on:
@@ -107,15 +269,29 @@ def _compute_dsd(nctn, ncat=0, designChoice="dsd"):
     Outputs: f: design matrix (-1,0,or 1) with a column for each of the
                 three level continuous variables, 1 or 2 for two level
                 categorical variables.
+                The matrix is int8: cast it, e.g., f.astype(float), before
+                matrix products such as f.T @ f, which overflow silently
+                in int8 beyond 127 runs.
+                The matrix is cached (see design_cache_info) and read-only:
+                copy it before modifying it.
 
     Validated against the equivalent JMP10 addin for all 1736 permutations
     of (nf=3:30, ncat=0:30,designChoice=1:2)
+    Since then, conference matrices of prime power orders (q=27, 49, 81, ...)
+    are built from GF(q), giving fewer runs than the next prime order,
+    e.g., for nf=27 and 28.
 
     See also ROWEXCH, DAUGMENT, DCOVARY, X2FX, CORDEXCH
     """
     if designChoice not in ["dsd", "orth"]:
         raise Exception("Design Choice must be 'dsd' or 'orth'")
 
+    return cached_call("design_cache", _cached_dsd, int(nctn), int(ncat), designChoice)
+
+
+@instrumented("dsd.build")
+def _build_dsd(nctn, ncat, designChoice):
+    """Compute the design matrix returned by _compute_dsd, marked as read-only."""
     f10 = np.array(
         [
             [0, 1, 1, 1, 1, 1, 1, 1, 1, 1],
@@ -138,7 +314,8 @@ def _compute_dsd(nctn, ncat=0, designChoice="dsd"):
             [-1, -1, 1, -1, -1, 1, 1, 0, -1, 1],
             [-1, -1, -1, 1, 1, -1, 1, -1, 0, 1],
             [-1, -1, -1, 1, -1, 1, -1, 1, 1, 0],
-        ]
+        ],
+        dtype=np.int8,
     )
     f16_half = np.array(
         [
@@ -158,113 +335,104 @@ def _compute_dsd(nctn, ncat=0, designChoice="dsd"):
             [-1, -1, 1, -1, -1, 1, 1, 1, -1, 1, -1, 1, 1, 0, -1, -1],
             [-1, 1, -1, 1, -1, -1, 1, 1, -1, -1, 1, -1, 1, 1, 0, -1],
             [-1, 1, 1, -1, 1, -1, -1, 1, -1, -1, -1, 1, -1, 1, 1, 0],
-        ]
+        ],
+        dtype=np.int8,
     )
     f16 = np.vstack((f16_half, -1 * f16_half))
     nf = nctn + ncat  # number of total factors
 
-    if 2 * int(np.floor(nf / 2)) == nf:  # nf is even
-        p = nf - 1
-    else:  # nf is odd
-        p = nf
-
-    done = False
-    while not done:
-        if isprime(p):
-            c = np.hstack(
-                (np.vstack((np.zeros(1), np.ones((p, 1)))), np.vstack((np.ones((1, p)), get_paley_matrix(p))))
-            )
-            f = np.vstack((c, -c))
-            done = True
-        else:
-            p = p + 2
-
-    # Overvrite f for certain nf
-    if nf == 9:
-        f = f10[:, :9]
-    elif nf == 10:
-        f = f10
-    elif nf == 16:
-        f = f16
-    elif nf == 15:
-        f = f16[:, :15]
-    elif nf == 26 or nf == 25:
-        a = get_paley_matrix(13)
-        ## starter vector for B
-        strt = np.array([-1, -1, 1, -1, 1, 1, 1, 1, 1, -1, 1, 1, 1])
-        b = np.array([])
-        ## construct B
-        for _ in range(13):
-            if b.size == 0:
-                b = np.transpose(strt)
-            else:
-                b = np.transpose(np.vstack((np.transpose(b), strt)))
-
-            strt = np.roll(strt, (0, -1))  # circshift
-        c = np.vstack((np.hstack((a, b)), np.hstack((np.transpose(b), -1 * a))))
-
-        if nf == 26:
+    with stage("dsd.prime_search"):
+        construction, p = get_construction(nf)
+    with stage("dsd.conference_matrix") as conference_stage:
+        if construction == "paley":
+            c = np.empty((p + 1, p + 1), dtype=np.int8)
+            c[0, 0] = 0
+            c[0, 1:] = 1
+            c[1:, 0] = 1
+            c[1:, 1:] = get_paley_matrix(p)
             f = np.vstack((c, -c))
-        else:
+        elif construction == "f10":
+            f = f10
+        elif construction == "f16":
+            f = f16
+        elif construction == "circulant13":
+            a = get_paley_matrix(13)
+            ## starter vector for B
+            strt = np.array([-1, -1, 1, -1, 1, 1, 1, 1, 1, -1, 1, 1, 1], dtype=np.int8)
+            b = np.array([])
+            ## construct B
+            for _ in range(13):
+                if b.size == 0:
+                    b = np.transpose(strt)
+                else:
+                    b = np.transpose(np.vstack((np.transpose(b), strt)))
+
+                strt = np.roll(strt, (0, -1))  # circshift
+            c = np.vstack((np.hstack((a, b)), np.hstack((np.transpose(b), -1 * a))))
             f = np.vstack((c, -c))
+        conference_stage.add_bytes(f)
+
+    with stage("dsd.foldover") as foldover_stage:
+        nr, nc = f.shape  # Number of rows and columns before adding categoricals
+        if nc > nf:  # Reduce the number of columns
+            f = f[:, :nf]
+
+        # Add center at the end
+        zero_nrows = _get_n_centers(ncat, designChoice)
+        f = np.vstack((f, np.zeros((zero_nrows, nf), dtype=np.int8)))
+
+        # Interleave each run with its foldover
+        tmpf = f.copy()
+        tmpf[0:nr:2, :] = f[: nr // 2, :]
+        tmpf[1:nr:2, :] = f[nr // 2 : nr, :]
+        f = tmpf
+        foldover_stage.add_bytes(f)
+
+    with stage("dsd.categorical_recode"):
+        # Correct the categorical values of the centers
+        if ncat > 1:
+            if designChoice == "dsd":  # there are 2 centers
+                B = np.array([[-1, -1, -1], [+1, +1, +1]])  # WEIRD: column is not important as all columns are same!
+            elif designChoice == "orth":  # there are 4 centers
+                B = np.array([[-1, -1, -1, +1], [-1, -1, +1, -1], [-1, +1, -1, -1], [+1, -1, -1, -1]])
+            colidx = np.remainder(np.arange(ncat), B.shape[1])
+            f[nr : (nr + B.shape[0]), nctn:nf] = B[:, colidx]
+
+        # Add columns for categoricals
+        # Note: in the original code there was minList2 and maxList2 lists that seem unnecessary
+        #       and were replaced here with minCatLevel and maxCatLevel, which are simply 1 and 2
+        if ncat > 0:
+            minCatLevel = 1
+            maxCatLevel = 2
+            if designChoice == "dsd":
+                # in matlab even rows are minCatLevel, odd rows are maxCatLevel
+                # but this is the opposite in python where idx starts from 0
+                odd_rows = np.remainder(np.arange(f.shape[0]), 2)[:, np.newaxis] != 0
+                zeroCatLevel = np.where(odd_rows, minCatLevel, maxCatLevel)
+            elif designChoice == "orth":
+                zeroCatLevel = maxCatLevel
+            cat = f[:, nctn:nf]
+            f[:, nctn:nf] = np.where(cat == 1, maxCatLevel, np.where(cat == -1, minCatLevel, zeroCatLevel))
+
+    f.flags.writeable = False
+    return f
 
-    nr, nc = f.shape  # Number of rows and columns before adding categoricals
-    if nc > nf:  # Reduce the number of columns
-        f = f[:, :nf]
 
-    # Add center at the end
-    if ncat == 0:
-        zero_nrows = 1
-    elif ncat == 1:
-        zero_nrows = 2
-    elif ncat > 1:
-        if designChoice == "dsd":
-            zero_nrows = 2
-        elif designChoice == "orth":
-            zero_nrows = 4
-    f = np.vstack((f, np.zeros((zero_nrows, nf))))
-
-    tmpf = f.copy()
-    for rowidx in range(int(nr / 2)):
-        tmpf[2 * rowidx, :] = f[rowidx, :]
-        tmpf[2 * rowidx + 1, :] = f[rowidx + int(nr / 2), :]
-    f = tmpf.copy()
-
-    # Correct the categorical values of the centers
-    if ncat > 1:
-        if designChoice == "dsd":  # there are 2 centers
-            B = np.array([[-1, -1, -1], [+1, +1, +1]])
-            for fidx in range(nctn, nf):
-                colidx = np.remainder(fidx - nctn, 3)
-                f[nr : (nr + 2), fidx] = B[:, colidx]  # WEIRD: colidx is not important as all columns of B are same!
-        elif designChoice == "orth":  # there are 4 centers
-            B = np.array([[-1, -1, -1, +1], [-1, -1, +1, -1], [-1, +1, -1, -1], [+1, -1, -1, -1]])
-            for fidx in range(nctn, nf):
-                colidx = np.remainder(fidx - nctn, 4)
-                f[nr : (nr + 4), fidx] = B[:, colidx]
-
-    # Add columns for categoricals
-    # Note: in the original code there was minList2 and maxList2 lists that seem unnecessary
-    #       and were replaced here with minCatLevel and maxCatLevel, which are simply 1 and 2
-    if ncat > 0:
-        minCatLevel = 1
-        maxCatLevel = 2
-        nr = f.shape[0]  # Update nr
-        for fidx in range(nctn, nf):  # categorical columns
-            for rowidx in range(nr):  # all rows
-                if f[rowidx, fidx] == 1:
-                    f[rowidx, fidx] = maxCatLevel
-                if f[rowidx, fidx] == -1:
-                    f[rowidx, fidx] = minCatLevel
-                if f[rowidx, fidx] == 0:
-                    if designChoice == "dsd":
-                        # in matlab even rows are minCatLevel, odd rows are maxCatLevel
-                        # but this is the opposite in python where idx starts from 0
-                        if np.remainder(rowidx, 2) != 0:
-                            f[rowidx, fidx] = minCatLevel
-                        else:
-                            f[rowidx, fidx] = maxCatLevel
-                    elif designChoice == "orth":
-                        f[rowidx, fidx] = maxCatLevel
+_cached_dsd = lru_cache(maxsize=DESIGN_CACHE_SIZE)(_build_dsd)
 
-    return f
+
+def design_cache_info():
+    """Return hits, misses, maxsize and current size of the cache of coded designs used by _compute_dsd."""
+    return _cached_dsd.cache_info()
+
+
+def clear_design_cache():
+    """Empty the cache of coded designs and reset its statistics."""
+    _cached_dsd.cache_clear()
+
+
+def set_design_cache_size(maxsize):
+    """Change the maximum number of coded designs kept in memory (None for unbounded, 0 to disable caching).
+    The current cache content and statistics are discarded."""
+    global _cached_dsd
+    _cached_dsd = lru_cache(maxsize=maxsize)(_build_dsd)
@@ -1,63 +1,275 @@
 """Tools to analyse a DOE and the response collected with it."""
 
-from itertools import combinations
+import os
+from functools import lru_cache
+from itertools import chain, combinations
 
-import matplotlib.pyplot as plt
 import numpy as np
-import seaborn as sns
 
+from ._generalized_dsd import next_prime
+from .instrumentation import cached_call, instrumented
 
-DEFAULT_MODEL_EFFECTS = ("intercept", "main", "2-interactions", "quadratic")
 
+def _import_plotting():
+    """Import matplotlib and seaborn only when a plot is requested, since they are slow to import and optional
+    (pip install definitive_screening_design[plot])."""
+    try:
+        import matplotlib.pyplot as plt
+        import seaborn as sns
+    except ImportError as error:
+        raise ImportError(
+            "Plotting requires matplotlib and seaborn: pip install definitive_screening_design[plot]"
+        ) from error
+    return plt, sns
 
-def get_X(A, effects=DEFAULT_MODEL_EFFECTS, return_names=False):
-    """Build the model matrix for a design and requested effects.
 
-    If ``return_names`` is true, also return the polynomial term names.
-    """
+def _import_figure():
+    """Import the matplotlib Figure only, drawn off-screen without pyplot, so that no GUI backend is started."""
+    try:
+        from matplotlib.figure import Figure
+    except ImportError as error:
+        raise ImportError(
+            "Plotting requires matplotlib and seaborn: pip install definitive_screening_design[plot]"
+        ) from error
+    return Figure
+
+
+DEFAULT_MODEL_EFFECTS = ("intercept", "main", "2-interactions", "quadratic")
+_EFFECTS = ("intercept", "main", "2-interactions", "3-interactions", "quadratic")
+
 
-    nfactors = A.shape[1]
-    arrays_to_stack = []
+@lru_cache(maxsize=128)
+def _get_terms(nfactors, effects):
+    """Return the names of the model terms and their groups, for the requested effects (normalized to the
+    order of _EFFECTS). Each group is a (read-only) array with the indices of the factors multiplied in each
+    term of the group, one row per term: e.g., (0, 2) for X1*X3 and (1, 1) for X2^2."""
     names = []
+    groups = []
 
     if "intercept" in effects:
         names.append("(1)")
-        arrays_to_stack.append(np.ones(len(A)).reshape(-1, 1))
+        groups.append(np.zeros((1, 0), dtype=np.intp))
     if "main" in effects:
-        for i in range(nfactors):
-            names.append(f"X{i+1}")
-        arrays_to_stack.append(A)
+        names += [f"X{i+1}" for i in range(nfactors)]
+        groups.append(np.arange(nfactors).reshape(-1, 1))
     else:
         raise Exception("Main effects should be present!")
     if "2-interactions" in effects:
-        for i, j in combinations(range(nfactors), 2):
-            names.append(f"X{i+1}*X{j+1}")
-            arrays_to_stack.append((A[:, i] * A[:, j]).reshape(-1, 1))
+        pairs = np.column_stack(np.triu_indices(nfactors, 1))
+        names += [f"X{i+1}*X{j+1}" for i, j in pairs.tolist()]
+        groups.append(pairs)
     if "3-interactions" in effects:
-        for i, j, k in combinations(range(nfactors), 3):
-            names.append(f"X{i+1}*X{j+1}*X{k+1}")
-            arrays_to_stack.append((A[:, i] * A[:, j] * A[:, k]).reshape(-1, 1))
+        triples = np.fromiter(chain.from_iterable(combinations(range(nfactors), 3)), dtype=np.intp).reshape(-1, 3)
+        names += [f"X{i+1}*X{j+1}*X{k+1}" for i, j, k in triples.tolist()]
+        groups.append(triples)
     if "quadratic" in effects:
-        for i in range(A.shape[1]):
-            names.append(f"X{i+1}^2")
-            arrays_to_stack.append((A[:, i] * A[:, i]).reshape(-1, 1))
+        names += [f"X{i+1}^2" for i in range(nfactors)]
+        groups.append(np.repeat(np.arange(nfactors).reshape(-1, 1), 2, axis=1))
+
+    for group in groups:
+        group.flags.writeable = False
+    return names, groups
+
+
+def _normalize_effects(effects):
+    return tuple(effect for effect in _EFFECTS if effect in effects)
+
+
+def _parse_term(name, nfactors):
+    """Return (effect, factors) of a term named as in get_X, e.g., (2, (0, 3)) for 'X1*X4' or (4, (2, 2)) for
+    'X3^2', where effect indexes _EFFECTS (sorting by it gives the order of get_X), or None for other names."""
+    if name == "(1)":
+        return 0, ()
+    square = name.endswith("^2")
+    parts = (name[:-2] if square else name).split("*")
+    if not all(part[:1] == "X" and part[1:].isdigit() and part[1:2] != "0" for part in parts):
+        return None
+    factors = tuple(int(part[1:]) - 1 for part in parts)
+    if max(factors) >= nfactors:
+        return None
+    if square:
+        return (4, factors * 2) if len(factors) == 1 else None
+    if len(factors) > 3 or any(i >= j for i, j in zip(factors, factors[1:])):
+        return None
+    return len(factors), factors
+
+
+def _get_term_columns(A, terms):
+    """Model matrix (float) of the terms given as (effect, factors) by _parse_term, without building get_X."""
+    A = np.asarray(A, dtype=float)
+    X = np.empty((len(A), len(terms)))
+    for j, (_, factors) in enumerate(terms):
+        X[:, j] = np.prod(A[:, list(factors)], axis=1)
+    return X
 
-    X = np.hstack(arrays_to_stack)
+
+def _get_X_dtype(A, effects, dtype):
+    if dtype is None:
+        # Integer designs (e.g., int8 coded) give float64 terms, whose products (e.g., X.T @ X) cannot overflow
+        return A.dtype if A.dtype.kind in "fc" else np.dtype(np.float64)
+    dtype = np.dtype(dtype)
+    if dtype.kind in "iu" and A.size > 0:
+        # Exact integer terms, in a type wide enough for the largest product
+        degree = 3 if "3-interactions" in effects else 2 if effects not in [("main",), ("intercept", "main")] else 1
+        bound = max(-int(A.min()), int(A.max())) ** degree
+        if bound > np.iinfo(np.int64).max:
+            return np.dtype(np.float64)
+        return np.result_type(dtype, np.min_scalar_type(-bound))
+    return dtype
+
+
+def _fill_terms(At, groups, start, stop, out):
+    """Write the terms from @start to @stop (excluded) in the rows of @out, given the transposed design @At."""
+    # Multiply in the wider type, e.g., int16 for the products of an int8 design widened by _get_X_dtype
+    dtype = np.result_type(At.dtype, out.dtype)
+    offset = 0
+    for group in groups:
+        a, b = max(start - offset, 0), min(stop - offset, len(group))
+        offset += len(group)
+        if a >= b:
+            continue
+        idx = group[a:b]
+        rows = out[offset - len(group) + a - start : offset - len(group) + b - start]
+        if idx.shape[1] == 0:
+            rows[:] = 1
+        elif idx.shape[1] == 1:
+            rows[:] = At[idx[:, 0]]
+        else:
+            np.multiply(At[idx[:, 0]], At[idx[:, 1]], out=rows, dtype=dtype, casting="unsafe")
+            for k in range(2, idx.shape[1]):
+                np.multiply(rows, At[idx[:, k]], out=rows, casting="unsafe")
+    return out
+
+
+@instrumented("analysis.get_X")
+def get_X(A, effects=DEFAULT_MODEL_EFFECTS, return_names=False, dtype=None):
+    """Build the model matrix for a design and requested effects.
+
+    If ``return_names`` is true, also return the polynomial term names.
+    ``dtype`` is the type of the model matrix (e.g., ``np.float32`` to halve the memory): by default it is
+    the type of ``A`` if floating, float64 otherwise (e.g., for int8 coded designs). With an integer ``dtype``,
+    e.g., ``np.int8``, the terms are exact integers, the type being widened only if a product could overflow
+    it: cast the matrix before products such as ``X.T @ X``, which can overflow it.
+    """
+
+    A = np.asarray(A)
+    effects = _normalize_effects(effects)
+    names, groups = cached_call("terms_cache", _get_terms, A.shape[1], effects)
+
+    # Fill the transposed matrix, so that each term is a contiguous row, and return its (Fortran ordered) view.
+    At = np.ascontiguousarray(A.T)
+    Xt = np.empty((len(names), len(A)), dtype=_get_X_dtype(A, effects, dtype))
+    X = _fill_terms(At, groups, 0, len(names), Xt).T
 
     if return_names:
-        return X, names
+        return X, list(names)
     else:
         return X
 
 
+def _prepare_blocks(A, effects, dtype):
+    """Return the transposed design, the term names and groups and the dtype of the model matrix."""
+    A = np.asarray(A)
+    effects = _normalize_effects(effects)
+    names, groups = cached_call("terms_cache", _get_terms, A.shape[1], effects)
+    return np.ascontiguousarray(A.T), names, groups, _get_X_dtype(A, effects, dtype)
+
+
+def _get_X_block(At, groups, start, stop, dtype):
+    return _fill_terms(At, groups, start, stop, np.empty((stop - start, At.shape[1]), dtype=dtype)).T
+
+
+def iter_X_blocks(A, effects=DEFAULT_MODEL_EFFECTS, block_size=1024, dtype=None):
+    """Generate the model matrix of get_X in blocks of at most ``block_size`` columns, as tuples
+    (X_block, names_block), so that the memory used depends on the block size and not on the number of terms.
+    """
+    At, names, groups, dtype = _prepare_blocks(A, effects, dtype)
+    for start in range(0, len(names), block_size):
+        stop = min(start + block_size, len(names))
+        yield _get_X_block(At, groups, start, stop, dtype), names[start:stop]
+
+
+@instrumented("analysis.get_XtX")
+def get_XtX(A, effects=DEFAULT_MODEL_EFFECTS, block_size=1024, dtype=np.float64, out=None):
+    """Compute the information matrix X.T @ X of get_X block by block, without building X.
+
+    ``out`` can be a preallocated (e.g., memory-mapped) terms x terms array to write the result in.
+    """
+    At, names, groups, dtype = _prepare_blocks(A, effects, dtype)
+    n_terms = len(names)
+    if out is None:
+        out = np.empty((n_terms, n_terms), dtype=dtype)
+
+    starts = range(0, n_terms, block_size)
+    for si in starts:
+        Xi = _get_X_block(At, groups, si, min(si + block_size, n_terms), dtype)
+        for sj in starts[si // block_size :]:
+            Xj = Xi if sj == si else _get_X_block(At, groups, sj, min(sj + block_size, n_terms), dtype)
+            gram = Xi.T @ Xj
+            out[si : si + gram.shape[0], sj : sj + gram.shape[1]] = gram
+            out[sj : sj + gram.shape[1], si : si + gram.shape[0]] = gram.T
+    return out
+
+
+@instrumented("analysis.get_XtY")
+def get_XtY(A, Y, effects=DEFAULT_MODEL_EFFECTS, block_size=1024, dtype=np.float64):
+    """Compute X.T @ Y of get_X block by block, for the responses Y (one column each, or a vector)."""
+    Y = np.asarray(Y, dtype=dtype)
+    At, names, groups, dtype = _prepare_blocks(A, effects, dtype)
+    out = np.empty((len(names),) + Y.shape[1:], dtype=np.result_type(dtype, Y.dtype))
+    for start in range(0, len(names), block_size):
+        stop = min(start + block_size, len(names))
+        out[start:stop] = _get_X_block(At, groups, start, stop, dtype).T @ Y
+    return out
+
+
+@instrumented("analysis.get_column_stats")
+def get_column_stats(A, effects=DEFAULT_MODEL_EFFECTS, block_size=1024, dtype=np.float64):
+    """Compute mean, standard deviation and euclidean norm of each column of get_X block by block.
+
+    Outputs:
+
+        stats (dict)
+            {"names": list of term names, "mean": numpy.array, "std": numpy.array, "norm": numpy.array}
+    """
+    At, names, groups, dtype = _prepare_blocks(A, effects, dtype)
+    stats = {"names": list(names)}
+    for key in ["mean", "std", "norm"]:
+        stats[key] = np.empty(len(names), dtype=dtype)
+    for start in range(0, len(names), block_size):
+        stop = min(start + block_size, len(names))
+        X = _get_X_block(At, groups, start, stop, dtype)
+        stats["mean"][start:stop] = np.mean(X, axis=0)
+        stats["std"][start:stop] = np.std(X, axis=0)
+        stats["norm"][start:stop] = np.linalg.norm(X, axis=0)
+    return stats
+
+
+def _get_rank(singular_values, shape):
+    """Numerical rank of a matrix of the given shape from its singular values (sorted in decreasing order)."""
+    if singular_values.size == 0:
+        return 0
+    tolerance = singular_values[0] * max(shape) * np.finfo(singular_values.dtype).eps
+    return int(np.count_nonzero(singular_values > tolerance))
+
+
+def _solve_lower_triangular(L, B):
+    """Solve L @ Z = B by forward substitution, for a lower triangular L and many right-hand sides B."""
+    Z = np.empty(np.shape(B), dtype=np.result_type(L, B, float))
+    for i in range(len(L)):
+        Z[i] = (B[i] - L[i, :i] @ Z[:i]) / L[i, i]
+    return Z
+
+
+@instrumented("analysis.get_efficiency")
 def get_efficiency(A, effects=("intercept", "main")):
     """https://www.jmp.com/support/help/Evaluate_Design_Window.shtml#168318
     p = n_params
     n = n_trials
 
-    NOTE: G-Efficiency and I-Efficiency require a grid or Monte Carlo evaluation
-          of the variance (see get_variance) in the whole design space
-          (typically -1 to 1 in every factor dimension).
+    NOTE: G-Efficiency and I-Efficiency require the variance (see get_variance) in the whole
+          design space (typically -1 to 1 in every factor dimension): see get_g_efficiency
+          and get_i_efficiency.
     """
     X = np.asarray(get_X(A, effects=effects), dtype=float)
     n_trials, n_params = X.shape
@@ -66,17 +278,7 @@ def get_efficiency(A, effects=("intercept", "main")):
     # inverse.  This avoids spurious negative determinants from round-off and
     # makes the non-estimable case explicit.
     singular_values = np.linalg.svd(X, compute_uv=False)
-    if singular_values.size < n_params:
-        rank = singular_values.size
-    elif singular_values.size == 0:
-        rank = 0
-    else:
-        tolerance = (
-            singular_values[0]
-            * max(X.shape)
-            * np.finfo(singular_values.dtype).eps
-        )
-        rank = np.count_nonzero(singular_values > tolerance)
+    rank = _get_rank(singular_values, X.shape)
 
     if rank < n_params:
         D_eff = 0.0
@@ -103,38 +305,422 @@ def get_efficiency(A, effects=("intercept", "main")):
     }
 
 
+def _get_stacked_efficiency(Xs, method="auto"):
+    """Rank, D- and A-Efficiency (%) of a stack of model matrices of the same shape (n_designs, n, p).
+
+    With method 'auto' the Cholesky factor L of X.T @ X is used for the well conditioned matrices
+    (det = prod(diag(L)^2), trace(inv) = ||inv(L)||^2), the singular values of X (as in get_efficiency) for
+    the others; method 'svd' always uses the singular values.
+    """
+    n_designs, n_trials, n_params = Xs.shape
+    rank = np.zeros(n_designs, dtype=int)
+    D_eff = np.zeros(n_designs)
+    A_eff = np.zeros(n_designs)
+
+    use_svd = np.ones(n_designs, dtype=bool)
+    if method == "auto" and n_trials >= n_params > 0:
+        try:
+            L = np.linalg.cholesky(np.matmul(np.swapaxes(Xs, 1, 2), Xs))
+        except np.linalg.LinAlgError:  # at least one matrix is not positive definite
+            pass
+        else:
+            diagonal = np.diagonal(L, axis1=1, axis2=2)
+            # (max/min of diag(L))^2 is a lower bound of the condition number of X.T @ X
+            well = np.min(diagonal, axis=1) > np.sqrt(1e-8) * np.max(diagonal, axis=1)
+            rank[well] = n_params
+            D_eff[well] = 100.0 * np.exp(2.0 * np.mean(np.log(diagonal[well]), axis=1)) / n_trials
+            L_inverse = np.linalg.inv(L[well])
+            A_eff[well] = 100.0 * n_params / (n_trials * np.sum(L_inverse**2, axis=(1, 2)))
+            use_svd = ~well
+    elif method not in ["auto", "svd"]:
+        raise ValueError(f"Method `{method}` must be 'auto' or 'svd'")
+
+    if np.any(use_svd):
+        singular_values = np.linalg.svd(Xs[use_svd], compute_uv=False)
+        rank[use_svd] = [_get_rank(sv, (n_trials, n_params)) for sv in singular_values]
+        full = np.flatnonzero(use_svd)[rank[use_svd] == n_params]
+        singular_values = singular_values[rank[use_svd] == n_params]
+        D_eff[full] = 100.0 * np.exp(2.0 * np.mean(np.log(singular_values), axis=1)) / n_trials
+        A_eff[full] = 100.0 * n_params / (n_trials * np.sum(singular_values**-2, axis=1))
+
+    return rank, D_eff, A_eff
+
+
+@instrumented("analysis.get_efficiency_table")
+def get_efficiency_table(designs, effects_list=(("intercept", "main"),), method="auto"):
+    """Compute the D- and A-Efficiency of get_efficiency for many designs and model hypotheses at once.
+
+    Model matrices with the same shape are grouped and evaluated with stacked linear algebra (see
+    _get_stacked_efficiency): use method='svd' to always use the singular values, as get_efficiency.
+
+    Inputs:
+
+        designs (dict, list or numpy.array)
+            Designs to compare: a dict {label: design}, a list of designs or a 3D array (n_designs, n, k).
+
+        effects_list (list of tuples)
+            Effects of each model hypothesis, as in get_X.
+
+    Outputs:
+
+        efficiency_table (pandas.DataFrame)
+            One row per design and effects, with columns "Design", "Effects", "Number of Trials",
+            "Number of Parameters", "Rank", "D-Efficiency (%)" and "A-Efficiency (%)".
+    """
+    import pandas as pd
+
+    if isinstance(designs, dict):
+        labels, designs = list(designs.keys()), list(designs.values())
+    else:
+        labels = list(range(len(designs)))
+
+    rows = {}
+    for k, effects in enumerate(effects_list):
+        groups = {}
+        for i, design in enumerate(designs):
+            X = get_X(design, effects=effects, dtype=float)
+            groups.setdefault(X.shape, []).append((i, X))
+        for (n_trials, n_params), items in groups.items():
+            rank, D_eff, A_eff = _get_stacked_efficiency(np.stack([X for _, X in items]), method)
+            for j, (i, _) in enumerate(items):
+                rows[(k, i)] = {
+                    "Design": labels[i],
+                    "Effects": ", ".join(_normalize_effects(effects)),
+                    "Number of Trials": n_trials,
+                    "Number of Parameters": n_params,
+                    "Rank": rank[j],
+                    "D-Efficiency (%)": D_eff[j],
+                    "A-Efficiency (%)": A_eff[j],
+                }
+
+    return pd.DataFrame([rows[key] for key in sorted(rows)])
+
+
+@instrumented("analysis.get_robustness_report")
+def get_robustness_report(A, effects=("intercept", "main"), max_lost=2, tol=1e-8, chunk_size=256):
+    """Score how the design degrades when any run, or any pair of runs, is lost.
+
+    X.T @ X is factorized only once: for the lost runs S, the leverages H = X @ inv(X.T @ X) @ X.T give
+    det(X.T @ X - X_S.T @ X_S) = det(X.T @ X) * det(I - H_SS) and, by the Woodbury identity,
+    trace(inv(X.T @ X - X_S.T @ X_S)) = trace(inv(X.T @ X)) + trace(inv(I - H_SS) @ K_SS)
+    with K = X @ inv(X.T @ X)^2 @ X.T. The model is not estimable anymore when det(I - H_SS) < tol.
+
+    Inputs:
+
+        max_lost (int)
+            Maximum number of lost runs: all the combinations of 1 to max_lost runs are scored.
+
+        chunk_size (int)
+            Number of deletions whose correlation matrices are updated at once (bounds the memory used).
+
+    Outputs:
+
+        robustness_report (pandas.DataFrame)
+            One row per set of "Lost Runs" (positions in A, starting with the full design), with columns
+            "Number of Trials", "Estimable", "D-Efficiency (%)", "A-Efficiency (%)" (as get_efficiency) and
+            "Max |Correlation|", the largest absolute correlation between two terms (excluding the intercept).
+    """
+    import pandas as pd
+
+    X = get_X(A, effects=effects, dtype=float)
+    n_trials, n_params = X.shape
+    lost = [np.zeros((1, 0), dtype=np.intp)]
+    lost += [np.array(list(combinations(range(n_trials), k)), dtype=np.intp) for k in range(1, max_lost + 1)]
+
+    L = None
+    try:
+        L = np.linalg.cholesky(X.T @ X)
+    except np.linalg.LinAlgError:  # the full design is already not estimable
+        pass
+    if L is not None and np.min(np.diag(L)) > np.sqrt(tol) * np.max(np.diag(L)):
+        L_inverse = _solve_lower_triangular(L, np.eye(n_params))
+        information_inverse = L_inverse.T @ L_inverse
+        V = information_inverse @ X.T
+        H = X @ V
+        K = V.T @ V
+    else:
+        L = None
+
+    Xv = X[:, np.ptp(X, axis=0) > 0]  # the intercept, and any constant term, has no correlation
+    sums, cross = Xv.sum(axis=0), Xv.T @ Xv
+    diagonal = np.eye(Xv.shape[1], dtype=bool)
+
+    rows = []
+    for S in lost:
+        n_remaining = n_trials - S.shape[1]
+        estimable = np.zeros(len(S), dtype=bool)
+        D_eff = np.zeros(len(S))
+        A_eff = np.zeros(len(S))
+
+        if L is not None and n_remaining >= n_params:
+            rows_idx, cols_idx = S[:, :, np.newaxis], S[:, np.newaxis, :]
+            B = np.eye(S.shape[1]) - H[rows_idx, cols_idx]
+            det_B = np.linalg.det(B)
+            estimable = det_B > tol
+            log_det = 2.0 * np.sum(np.log(np.diag(L))) + np.log(det_B[estimable])
+            trace_inverse = np.trace(information_inverse) + np.trace(
+                np.linalg.solve(B[estimable], K[rows_idx, cols_idx][estimable]), axis1=1, axis2=2
+            )
+            D_eff[estimable] = 100.0 * np.exp(log_det / n_params) / n_remaining
+            A_eff[estimable] = 100.0 * n_params / (n_remaining * trace_inverse)
+
+        # Correlations of the remaining runs, from rank-S updates of the column sums and cross products
+        max_correlation = np.full(len(S), np.nan)
+        for start in range(0, len(S) if Xv.shape[1] > 1 and n_remaining > 1 else 0, chunk_size):
+            XS = Xv[S[start : start + chunk_size]]
+            c = sums - XS.sum(axis=1)
+            covariance = cross - np.einsum("bsi,bsj->bij", XS, XS)
+            covariance -= c[:, :, np.newaxis] * c[:, np.newaxis, :] / n_remaining
+            std = np.sqrt(np.maximum(np.diagonal(covariance, axis1=1, axis2=2), 0.0))
+            with np.errstate(divide="ignore", invalid="ignore"):
+                correlation = np.abs(covariance / (std[:, :, np.newaxis] * std[:, np.newaxis, :]))
+            correlation[:, diagonal] = np.nan
+            correlation[~np.isfinite(correlation)] = np.nan
+            max_correlation[start : start + chunk_size] = np.minimum(_nanmax(correlation.reshape(len(XS), -1)), 1.0)
+
+        rows.append(
+            pd.DataFrame(
+                {
+                    "Lost Runs": [tuple(runs) for runs in S.tolist()],
+                    "Number of Trials": n_remaining,
+                    "Estimable": estimable,
+                    "D-Efficiency (%)": D_eff,
+                    "A-Efficiency (%)": A_eff,
+                    "Max |Correlation|": max_correlation,
+                }
+            )
+        )
+    return pd.concat(rows, ignore_index=True)
+
+
+def _nanmax(values):
+    """Maximum of each row ignoring nan (nan for all-nan rows), without warnings."""
+    values = np.where(np.isnan(values), -np.inf, values)
+    maximum = np.max(values, axis=1)
+    maximum[np.isneginf(maximum)] = np.nan
+    return maximum
+
+
+@instrumented("analysis.get_variance")
 def get_variance(x, A, effects=("intercept", "main")):
     """https://www.jmp.com/support/help/Evaluate_Design_Window.shtml#168318
     x is a numpy.array vertical vector
+
+    To evaluate many batches of points for the same design, use DesignEvaluator.
     """
-    n_factors, n_samples = x.shape
+    return DesignEvaluator(A, effects=effects).variance(x)
 
-    x_copy = x.copy()
 
-    if "intercept" in effects:
-        x = np.vstack([np.ones([1, n_samples]), x])
-    if "main" not in effects:
-        raise Exception("Main effects should be present!")
-    if "2-interactions" in effects:
-        for i, j in combinations(range(n_factors), 2):
-            xixj = x_copy[i, :] * x_copy[j, :]
-            x = np.vstack([x, xixj])
-    if "3-interactions" in effects:
-        for i, j, k in combinations(range(n_factors), 3):
-            xixjxk = x_copy[i, :] * x_copy[j, :] * x_copy[k, :]
-            x = np.vstack([x, xixjxk])
-    if "quadratic" in effects:
-        x = np.vstack([x, x_copy**2])
-
-    X = get_X(A, effects=effects)
-    XTX = np.dot(X.T, X)
-    if np.linalg.matrix_rank(X) < X.shape[1]:
-        raise np.linalg.LinAlgError(
-            "Prediction variance is undefined because the requested model "
-            "matrix is rank deficient."
+class DesignEvaluator:
+    """Prediction variance of a design for a model, factorizing the information matrix only once.
+
+    The model matrix is factorized as X = QR, so that X.T @ X = R.T @ R and the (relative) prediction variance
+    at the point x is x.T @ inv(X.T @ X) @ x = ||z||^2 with R.T @ z = x: no inverse is ever formed.
+
+    Usage:
+
+        evaluator = DesignEvaluator(A, effects=("intercept", "main", "quadratic"))
+        evaluator.variance(x)  # x of shape (n_factors, n_points), as in get_variance
+    """
+
+    def __init__(self, A, effects=("intercept", "main"), chunk_size=65536):
+        """chunk_size (int) is the number of points expanded and solved at once, bounding the memory used."""
+        X, self.names = get_X(A, effects=effects, return_names=True, dtype=float)
+        self.effects = tuple(effects)
+        self.n_factors = np.shape(A)[1]
+        self.n_trials, self.n_params = X.shape
+        self.chunk_size = chunk_size
+
+        R = np.linalg.qr(X, mode="r")
+        if _get_rank(np.linalg.svd(R, compute_uv=False), X.shape) < self.n_params:
+            raise np.linalg.LinAlgError(
+                "Prediction variance is undefined because the requested model matrix is rank deficient."
+            )
+        self._Rt = np.ascontiguousarray(R.T)
+
+    def variance(self, x):
+        """Return the prediction variance at each point (column) of x, of shape (n_factors, n_points)."""
+        x = np.asarray(x)
+        if x.ndim != 2 or x.shape[0] != self.n_factors:
+            raise ValueError(f"x must have shape (n_factors={self.n_factors}, n_points).")
+
+        variance = np.empty(x.shape[1])
+        for start in range(0, x.shape[1], self.chunk_size):
+            stop = min(start + self.chunk_size, x.shape[1])
+            z = _solve_lower_triangular(self._Rt, get_X(x[:, start:stop].T, effects=self.effects, dtype=float).T)
+            variance[start:stop] = np.einsum("ij,ij->j", z, z)
+        return variance
+
+
+@lru_cache(maxsize=32)
+def get_moment_matrix(nfactors, effects=("intercept", "main"), categorical=()):
+    """Return the moment matrix of the terms of get_X, i.e., the average of f(x) @ f(x).T for x uniformly
+    distributed in the cube [-1, 1]^nfactors, computed in closed form: the average of x^a is 1/(a+1) for
+    even a and 0 for odd a, and factors are independent. The factors whose indexes are in the tuple categorical
+    are two-level, -1 or 1 with equal probability, so that the average of x^a is 1 for even a.
+    The result is cached and read-only."""
+    names, groups = _get_terms(nfactors, _normalize_effects(effects))
+    exponents = np.zeros((len(names), nfactors), dtype=np.intp)
+    row = 0
+    for group in groups:
+        for k in range(group.shape[1]):
+            np.add.at(exponents, (np.arange(row, row + len(group)), group[:, k]), 1)
+        row += len(group)
+
+    max_exponent = 2 * exponents.max(initial=0)
+    power = np.arange(max_exponent + 1)
+    moments = np.where(power % 2 == 0, 1.0 / (power + 1), 0.0)
+    two_level_moments = np.where(power % 2 == 0, 1.0, 0.0)
+    M = np.ones((len(names), len(names)))
+    for f in range(nfactors):
+        M *= (two_level_moments if f in categorical else moments)[
+            exponents[:, f, np.newaxis] + exponents[np.newaxis, :, f]
+        ]
+    M.flags.writeable = False
+    return M
+
+
+@instrumented("analysis.get_i_efficiency")
+def get_i_efficiency(A, effects=("intercept", "main")):
+    """Average prediction variance in the cube [-1, 1]^k (I-criterion), computed from the closed form moment
+    matrix of the model (see get_moment_matrix), without any sampling.
+
+    I-Efficiency is expressed, as D- and A-Efficiency, relative to a design with X.T @ X = n_trials * I:
+    100 * trace(M) / (n_trials * average_variance). It is 0 if the model is not estimable.
+    """
+    A = np.asarray(A)
+    M = cached_call("moment_matrix_cache", get_moment_matrix, A.shape[1], _normalize_effects(effects))
+    try:
+        evaluator = DesignEvaluator(A, effects=effects)
+    except np.linalg.LinAlgError:
+        average_variance, I_eff = np.inf, 0.0
+    else:
+        # trace(M @ inv(R.T @ R)) = trace(inv(R.T) @ M @ inv(R))
+        W = _solve_lower_triangular(evaluator._Rt, M)
+        average_variance = np.trace(_solve_lower_triangular(evaluator._Rt, W.T))
+        I_eff = 100.0 * np.trace(M) / (evaluator.n_trials * average_variance)
+
+    return {
+        "Number of Trials": A.shape[0],
+        "Number of Parameters": len(M),
+        "Average Variance of Prediction": average_variance,
+        "I-Efficiency (%)": I_eff,
+    }
+
+
+_G_EFFICIENCY_CHUNK_BYTES = 2**25  # Memory of the model terms expanded at once by each worker of get_g_efficiency
+
+
+def _first_primes(k):
+    primes = [2]
+    while len(primes) < k:
+        primes.append(next_prime(primes[-1] + 1))
+    return np.array(primes[:k])
+
+
+def _halton(start, stop, bases):
+    """Points from @start to @stop (excluded) of the Halton sequence in [0, 1)^len(bases), one per row."""
+    points = np.zeros((stop - start, len(bases)))
+    for d, base in enumerate(bases):
+        index = np.arange(start, stop)
+        scale = 1.0
+        while np.any(index > 0):
+            scale /= base
+            index, digit = np.divmod(index, base)
+            points[:, d] += digit * scale
+    return points
+
+
+@instrumented("analysis.get_g_efficiency")
+def get_g_efficiency(
+    A,
+    effects=("intercept", "main"),
+    batch_size=16384,
+    max_points=2**20,
+    tol=1e-6,
+    patience=4,
+    n_jobs=4,
+    seed=0,
+):
+    """Maximum prediction variance in the cube [-1, 1]^k and G-Efficiency, as defined by JMP:
+    100 * sqrt(n_params / n_trials) / sqrt(max_variance).
+
+    The maximum is searched on a (randomly shifted) Halton quasi-Monte Carlo sequence streamed in batches of
+    batch_size points, each point also snapped to the vertices and to the 3-levels grid of the cube. Batches
+    are evaluated across a pool of n_jobs threads, and the search stops when the maximum did not improve by
+    more than the relative tolerance tol for patience consecutive rounds, or after max_points points
+    (the last round is truncated to not exceed them). The best point is finally refined with a coordinate search.
+    The points are expanded to model terms in chunks of at most 32 MB, so that the memory used is bounded by
+    about n_jobs * (32 MB + 24 * batch_size * n_factors bytes), whatever the number of terms.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    A = np.asarray(A)
+    n_trials, n_factors = A.shape
+    n_params = len(_get_terms(n_factors, _normalize_effects(effects))[0])
+    # The model matrix of a chunk and its solution take 16 bytes per point and term
+    chunk_size = max(1, min(batch_size, _G_EFFICIENCY_CHUNK_BYTES // (16 * n_params)))
+    try:
+        evaluator = DesignEvaluator(A, effects=effects, chunk_size=chunk_size)
+    except np.linalg.LinAlgError:
+        return {
+            "Number of Trials": n_trials,
+            "Number of Parameters": n_params,
+            "Maximum Variance of Prediction": np.inf,
+            "Maximum Location": None,
+            "Number of Evaluated Points": 0,
+            "G-Efficiency (%)": 0.0,
+        }
+
+    bases = _first_primes(n_factors)
+    shift = np.random.default_rng(seed).uniform(size=n_factors)
+
+    def search(start, size):
+        x = 2.0 * np.remainder(_halton(start, start + size, bases) + shift, 1.0) - 1.0
+        candidates = np.vstack((x, np.where(x < 0, -1.0, 1.0), np.clip(np.rint(1.5 * x), -1, 1)))
+        variance = evaluator.variance(candidates.T)
+        best = np.argmax(variance)
+        return variance[best], candidates[best]
+
+    max_variance, location, n_sequence, stall = -np.inf, None, 0, 0
+    n_workers = n_jobs or 1
+    max_sequence = max(1, max_points // 3)  # each point of the sequence gives 3 candidates
+    with ThreadPoolExecutor(max_workers=n_workers) as pool:
+        while n_sequence < max_sequence and stall < patience:
+            stop = min(n_sequence + n_workers * batch_size, max_sequence)
+            starts = range(1 + n_sequence, 1 + stop, batch_size)
+            sizes = [min(batch_size, 1 + stop - start) for start in starts]
+            improved = False
+            for variance, point in pool.map(search, starts, sizes):
+                improved = improved or variance > max_variance * (1.0 + tol)
+                if variance > max_variance:
+                    max_variance, location = variance, point
+            n_sequence = stop
+            stall = 0 if improved else stall + 1
+    n_points = 3 * n_sequence
+
+    # Coordinate search around the best point, on a grid of levels for one factor at a time
+    levels = np.linspace(-1.0, 1.0, 41)
+    for _ in range(10):
+        candidates = np.repeat(location[np.newaxis, :], n_factors * len(levels), axis=0)
+        candidates[np.arange(len(candidates)), np.repeat(np.arange(n_factors), len(levels))] = np.tile(
+            levels, n_factors
         )
-    information_inverse = np.linalg.inv(XTX)
-    return np.einsum("ij,jk,ki->i", x.T, information_inverse, x)
+        variance = evaluator.variance(candidates.T)
+        n_points += len(candidates)
+        best = np.argmax(variance)
+        if variance[best] <= max_variance * (1.0 + tol):
+            break
+        max_variance, location = variance[best], candidates[best]
+
+    return {
+        "Number of Trials": n_trials,
+        "Number of Parameters": evaluator.n_params,
+        "Maximum Variance of Prediction": max_variance,
+        "Maximum Location": location,
+        "Number of Evaluated Points": n_points,
+        "G-Efficiency (%)": 100.0 * np.sqrt(evaluator.n_params / n_trials) / np.sqrt(max_variance),
+    }
 
 
 def _safe_column_correlation(X):
@@ -174,6 +760,7 @@ def _safe_column_correlation(X):
     return correlations
 
 
+@instrumented("analysis.get_map_of_correlations")
 def get_map_of_correlations(
     A,
     effects=(
@@ -187,6 +774,7 @@ def get_map_of_correlations(
     plot=True,
     annot=True,
     figsize=(11, 9),
+    output=None,
 ):
     """Get the map of correlations.
     Compare with: https://rdrr.io/cran/daewr/man/colormap.html
@@ -216,6 +804,11 @@ def get_map_of_correlations(
         figsize (tuple of length 2)
             Figure size.
 
+        output (str, path or file-like)
+            If given, the heatmap is rendered off-screen by render_map_of_correlations and saved there, e.g.,
+            "moc.png", "moc.svg" or an io.BytesIO, instead of being shown with seaborn. Much faster for hundreds
+            of terms, annotating only the cells above 0.5 if annot.
+
 
     Outputs:
 
@@ -236,7 +829,10 @@ def get_map_of_correlations(
     else:
         vmin = -1  # Colors won't looking good anyway
 
-    if plot:
+    if plot and output is not None:
+        render_map_of_correlations(moc, names, output, threshold=0.5 if annot else None, figsize=figsize)
+    elif plot:
+        plt, sns = _import_plotting()
         # Show the lower-left triangle, including its diagonal.
         mask = np.invert(np.tril(np.ones_like(moc, dtype=bool)))
         f, ax = plt.subplots(figsize=figsize)
@@ -255,3 +851,355 @@ def get_map_of_correlations(
         plt.show()
 
     return moc
+
+
+def _aggregate_blocks(moc, block):
+    """Maximum absolute correlation of each block x block group of terms, the diagonal excluded (nan if none)."""
+    n = len(moc)
+    m = -(-n // block)
+    padded = np.full((m * block, m * block), np.nan)
+    padded[:n, :n] = np.abs(moc)
+    np.fill_diagonal(padded, np.nan)
+    blocks = padded.reshape(m, block, m, block).transpose(0, 2, 1, 3).reshape(m, m, block * block)
+    valid = ~np.isnan(blocks)
+    aggregated = np.where(valid, blocks, -np.inf).max(axis=2)
+    aggregated[~valid.any(axis=2)] = np.nan
+    return aggregated
+
+
+@instrumented("analysis.render_map_of_correlations")
+def render_map_of_correlations(
+    moc,
+    names=None,
+    output="map_of_correlations.png",
+    threshold=0.5,
+    max_cells=200,
+    figsize=(11, 9),
+    dpi=100,
+    format=None,
+):
+    """Render the lower triangle of a map of correlations as a single image, off-screen, into a file.
+
+    Unlike the seaborn heatmap of get_map_of_correlations, the cells are one raster image, without per-cell
+    patches, so that maps of thousands of terms are rendered in about a second, and no GUI backend is needed.
+
+    Inputs:
+
+        moc (numpy.array)
+            Square map of correlations, e.g., from get_map_of_correlations(..., plot=False) or
+            get_map_of_correlations_blocked.
+
+        names (list of str)
+            Names of the terms, used as tick labels if there are few cells per side (default: term indices).
+
+        output (str, path or file-like)
+            Where to save the image, e.g., "moc.png", "moc.svg" or an io.BytesIO.
+
+        threshold (float)
+            Write the value of the off-diagonal cells whose absolute value is at least this (None to write none).
+            Values are written only if the cells are large enough to be readable.
+
+        max_cells (int)
+            Maximum number of cells per side: beyond it, consecutive terms are grouped in blocks and each cell
+            shows the maximum absolute correlation between the terms of two blocks (within a block on the diagonal).
+
+        figsize (tuple of length 2)
+            Figure size, in inches.
+
+        dpi (int)
+            Resolution of the image.
+
+        format (str)
+            Image format, e.g., "png" or "svg" (default: from the extension of output, else "png").
+
+    Outputs:
+
+        figure (matplotlib.figure.Figure)
+            The rendered figure, not attached to pyplot.
+    """
+    Figure = _import_figure()
+
+    moc = np.asarray(moc, dtype=float)
+    n = len(moc)
+    if moc.shape != (n, n):
+        raise ValueError(f"The map of correlations must be a square matrix, not {moc.shape}")
+    if names is not None and len(names) != n:
+        raise ValueError(f"There are {len(names)} names for {n} terms")
+    if format is None and not isinstance(output, (str, os.PathLike)):
+        format = "png"
+
+    block = max(1, -(-n // max_cells))
+    if block > 1:
+        cells = _aggregate_blocks(moc, block)
+        labels = None
+    else:
+        cells = moc.copy()
+        labels = names
+    m = len(cells)
+    cells[np.triu_indices(m, 1)] = np.nan  # Show the lower-left triangle, including its diagonal
+    vmin = 0.0 if block > 1 or not np.nanmin(moc, initial=0.0) < 0.0 else -1.0
+
+    figure = Figure(figsize=figsize, dpi=dpi)
+    ax = figure.add_subplot()
+    image = ax.imshow(
+        np.ma.masked_invalid(cells),
+        cmap="RdYlGn_r",
+        vmin=vmin,
+        vmax=1.0,
+        interpolation="nearest",
+        extent=(0, m * block, m * block, 0),
+    )
+    figure.colorbar(image, ax=ax, label="max |correlation| per block" if block > 1 else None)
+    if labels is not None and m <= 60:
+        ticks = np.arange(m) + 0.5
+        fontsize = min(10.0, 600.0 / m)
+        ax.set_xticks(ticks, labels, rotation=90, fontsize=fontsize)
+        ax.set_yticks(ticks, labels, fontsize=fontsize)
+    else:
+        ax.set_xlabel(f"Term index (blocks of {block} terms)" if block > 1 else "Term index")
+
+    # Write the values only if a cell is at least about 12 points wide
+    cell_points = 72.0 * min(figsize) * 0.8 / m
+    if threshold is not None and cell_points >= 12.0:
+        # The tolerance keeps the values rounded below the threshold, e.g. 0.4999999999999999 for 0.5
+        above = np.abs(np.nan_to_num(cells)) >= threshold - 1e-9
+        rows, cols = np.nonzero(np.tril(above, -1 if block == 1 else 0))
+        for i, j in zip(rows, cols):
+            ax.text(
+                (j + 0.5) * block,
+                (i + 0.5) * block,
+                f"{cells[i, j]:.2f}",
+                ha="center",
+                va="center",
+                fontsize=min(10.0, cell_points / 3.0),
+            )
+
+    figure.savefig(output, format=format, dpi=dpi, bbox_inches="tight")
+    return figure
+
+
+def _get_standardized_X(A, effects, block_size):
+    """Return the columns of get_X (without the intercept) centered and scaled to unit norm, built block by
+    block, and the term names. Constant columns, whose correlations are undefined, are filled with ``np.nan``
+    (see _safe_column_correlation)."""
+    effects = tuple(effect for effect in effects if effect != "intercept")
+    A = np.asarray(A, dtype=float)
+    if A.shape[0] < 2:
+        raise ValueError("At least two runs are required for correlations.")
+
+    names = _get_terms(A.shape[1], _normalize_effects(effects))[0]
+    Z = np.empty((A.shape[0], len(names)))
+    start = 0
+    for X, block_names in iter_X_blocks(A, effects, block_size):
+        Z_block = Z[:, start : start + X.shape[1]]
+        np.subtract(X, np.mean(X, axis=0), out=Z_block)
+        norms = np.linalg.norm(Z_block, axis=0)
+        column_scale = np.maximum(1.0, np.max(np.abs(X), axis=0))
+        variable = norms > np.finfo(float).eps * np.sqrt(X.shape[0]) * column_scale
+        Z_block[:, variable] /= norms[variable]
+        Z_block[:, ~variable] = np.nan
+        start += X.shape[1]
+    return Z, list(names)
+
+
+def _iter_correlation_rows(Z, block_size, n_jobs, task):
+    """Compute the correlations Z.T @ Z in blocks of @block_size rows across a pool of @n_jobs threads and
+    yield task(start, rows) for each block, in order."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    def run(start):
+        rows = np.clip(Z[:, start : start + block_size].T @ Z, -1.0, 1.0)
+        return task(start, rows)
+
+    with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+        yield from pool.map(run, range(0, Z.shape[1], block_size))
+
+
+@instrumented("analysis.get_map_of_correlations_blocked")
+def get_map_of_correlations_blocked(A, effects=_EFFECTS, absolute=True, block_size=256, n_jobs=None, out=None):
+    """Compute the same map of correlations of get_map_of_correlations (without plotting) tile by tile across
+    a pool of threads, writing it into ``out`` if given, e.g., a ``numpy.memmap`` of shape terms x terms,
+    so that the full map does not need to fit in memory.
+
+    Inputs:
+
+        block_size (int)
+            Number of terms in each block of rows computed by a thread.
+
+        n_jobs (int)
+            Number of threads (default of concurrent.futures if None).
+
+        out (numpy.array)
+            Preallocated output.
+
+    Outputs:
+
+            map_of_correlations (numpy.array)
+    """
+    Z, _ = _get_standardized_X(A, effects, block_size)
+    if out is None:
+        out = np.empty((Z.shape[1], Z.shape[1]))
+
+    def write(start, rows):
+        out[start : start + len(rows)] = np.abs(rows) if absolute else rows
+
+    for _ in _iter_correlation_rows(Z, block_size, n_jobs, write):
+        pass
+    return out
+
+
+@instrumented("analysis.get_aliased_pairs")
+def get_aliased_pairs(A, effects=_EFFECTS, threshold=0.5, top_k=None, block_size=256, n_jobs=None):
+    """Find the pairs of terms whose correlation is, in absolute value, at least ``threshold``,
+    without building the full map of correlations (see get_map_of_correlations_blocked).
+
+    If ``top_k`` is None each pair is returned once (col < row), otherwise each term is returned with its
+    (at most) ``top_k`` most correlated partners above the threshold, sorted by decreasing absolute value.
+
+    Outputs:
+
+        pairs (dict)
+            {"names": list of term names, "row": numpy.array, "col": numpy.array, "correlation": numpy.array}
+            where row and col are indices in names.
+    """
+    Z, names = _get_standardized_X(A, effects, block_size)
+
+    def find(start, rows):
+        magnitude = np.abs(rows)
+        magnitude[np.isnan(magnitude)] = -np.inf
+        magnitude[np.arange(len(rows)), start + np.arange(len(rows))] = -np.inf  # skip the diagonal
+        if top_k is None:
+            magnitude[np.arange(len(rows))[:, np.newaxis] + start <= np.arange(Z.shape[1])] = -np.inf
+            row, col = np.nonzero(magnitude >= threshold)
+        else:
+            k = min(top_k, Z.shape[1] - 1)
+            col = np.argpartition(-magnitude, k - 1, axis=1)[:, :k] if k > 0 else np.zeros((len(rows), 0), int)
+            col = np.take_along_axis(col, np.argsort(-np.take_along_axis(magnitude, col, axis=1), axis=1), axis=1)
+            row = np.repeat(np.arange(len(rows)), col.shape[1])
+            col = col.ravel()
+            keep = magnitude[row, col] >= threshold
+            row, col = row[keep], col[keep]
+        return row + start, col, rows[row, col]
+
+    results = list(_iter_correlation_rows(Z, block_size, n_jobs, find))
+    return {
+        "names": names,
+        "row": np.concatenate([row for row, _, _ in results]),
+        "col": np.concatenate([col for _, col, _ in results]),
+        "correlation": np.concatenate([correlation for _, _, correlation in results]),
+    }
+
+
+@instrumented("analysis.compare_models")
+def compare_models(A, Y, models, response_names=None, tol=1e-10):
+    """Compare candidate linear models of the responses by leave-one-out cross-validation, without refitting.
+
+    For a least squares fit with hat matrix H, the leave-one-out residual of run i is e_i / (1 - H_ii), so that
+    PRESS = sum((e_i / (1 - H_ii))^2) comes from a single fit. Each model is fitted from an orthonormal basis
+    Q of its terms (Gram-Schmidt), with H_ii = sum(Q[i, :]^2): the models are visited in the order of their
+    terms, so that the basis of the terms they have in common with the previous model is reused, and nested
+    models only add the columns of their extra terms. All the responses are fitted at once.
+
+    Inputs:
+
+        Y (numpy.array or pandas.DataFrame)
+            Responses, one column for each (or a vector for a single response), with the runs in the order of A.
+
+        models (list of list of str)
+            Terms of each candidate model, named as in get_X, e.g., [["(1)", "X1"], ["(1)", "X1", "X1^2"], ...].
+
+        response_names (list of str)
+            Names of the responses, default the columns of a DataFrame or Y1, Y2, ...
+
+    Outputs:
+
+        comparison (pandas.DataFrame)
+            One row for each model and response, in the order of models, with "Number of Terms", "Rank" (less than
+            the number of terms if some are aliased), "RMSE", "R Squared", "PRESS", "PRESS RMSE",
+            "Predicted R Squared", "AICc" and "BIC". The information criteria are based on the normal likelihood,
+            counting the error variance among the parameters; PRESS is infinite if some run has leverage 1.
+    """
+    import pandas as pd
+
+    A = np.asarray(A)
+    if response_names is None:
+        response_names = list(Y.columns) if hasattr(Y, "columns") else None
+    Y = np.asarray(Y, dtype=float)
+    if Y.ndim == 1:
+        Y = Y[:, np.newaxis]
+        response_names = response_names or ["Y"]
+    if response_names is None:
+        response_names = [f"Y{k + 1}" for k in range(Y.shape[1])]
+    n_trials = len(A)
+    if Y.shape[0] != n_trials:
+        raise ValueError(f"The responses have {Y.shape[0]} runs, but the design has {n_trials}")
+
+    # Only the columns of the terms in the models are built, in the order of get_X
+    terms = {}
+    for model in models:
+        for term in model:
+            if term not in terms:
+                terms[term] = _parse_term(term, A.shape[1])
+        unknown = [term for term in model if terms[term] is None]
+        if unknown:
+            raise ValueError(f"Unknown terms {unknown}: terms are named as in get_X, e.g., (1), X1, X1*X2, X1^2")
+    names = sorted(terms, key=terms.get)
+    X = _get_term_columns(A, [terms[name] for name in names])
+    column_of = {name: j for j, name in enumerate(names)}
+    columns = [tuple(sorted({column_of[term] for term in model})) for model in models]
+
+    # Depth-first visit of the models sorted by their columns: the stack holds, for each column of the current
+    # model, whether it was independent of the previous ones, the hat diagonal and the fitted values so far.
+    stack = []
+    rows = [None] * len(models)
+    total = np.sum((Y - Y.mean(axis=0)) ** 2, axis=0)
+    for m in sorted(range(len(models)), key=lambda m: columns[m]):
+        common = 0
+        while common < min(len(stack), len(columns[m])) and stack[common][0] == columns[m][common]:
+            common += 1
+        del stack[common:]
+        for j in columns[m][common:]:
+            hat, fitted, rank = stack[-1][2:] if stack else (np.zeros(n_trials), np.zeros_like(Y), 0)
+            q = X[:, j].copy()
+            for _ in range(2):  # re-orthogonalization keeps the basis orthonormal to working precision
+                for _, basis, *_ in stack:
+                    if basis is not None:
+                        q -= basis * (basis @ q)
+            norm = np.sqrt(q @ q)
+            if norm > tol * max(1.0, np.sqrt(X[:, j] @ X[:, j])):
+                q /= norm
+                stack.append((j, q, hat + q**2, fitted + np.outer(q, q @ Y), rank + 1))
+            else:  # aliased with the previous terms: the fit does not change
+                stack.append((j, None, hat, fitted, rank))
+
+        hat, fitted, rank = stack[-1][2:] if stack else (np.zeros(n_trials), np.zeros_like(Y), 0)
+        residuals = Y - fitted
+        rss = np.sum(residuals**2, axis=0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            loo_residuals = residuals / (1.0 - hat)[:, np.newaxis]
+            press = np.where(np.any(hat > 1.0 - 1e-10), np.inf, np.sum(loo_residuals**2, axis=0))
+            n_params = rank + 1  # the error variance is a parameter too
+            log_likelihood = -0.5 * n_trials * (np.log(2.0 * np.pi * rss / n_trials) + 1.0)
+            aicc = -2.0 * log_likelihood + 2.0 * n_params
+            if n_trials > n_params + 1:
+                aicc = aicc + 2.0 * n_params * (n_params + 1) / (n_trials - n_params - 1)
+            else:
+                aicc = np.full(len(rss), np.inf)
+            rows[m] = {
+                "Number of Terms": len(columns[m]),
+                "Rank": rank,
+                "RMSE": np.sqrt(rss / (n_trials - rank)) if n_trials > rank else np.full(len(rss), np.nan),
+                "R Squared": 1.0 - rss / total,
+                "PRESS": press,
+                "PRESS RMSE": np.sqrt(press / n_trials),
+                "Predicted R Squared": 1.0 - press / total,
+                "AICc": aicc,
+                "BIC": -2.0 * log_likelihood + n_params * np.log(n_trials),
+            }
+
+    comparison = pd.DataFrame(
+        [{"Model": m, "Response": response_nm} for m in range(len(models)) for response_nm in response_names]
+    )
+    for key in rows[0] if rows else []:
+        comparison[key] = np.concatenate([np.broadcast_to(row[key], (len(response_names),)) for row in rows])
+    return comparison
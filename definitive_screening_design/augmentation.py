@@ -0,0 +1,251 @@
+"""Augment an existing design with new runs, chosen by coordinate exchange (Meyer and Nachtsheim 1995).
+
+The information matrix M = X.T @ X is inverted only once per pass over the new runs: every exchange of a
+coordinate replaces a row x of the model matrix with a candidate row c, i.e., M' = M + U @ V.T with U = [c, x]
+and V = [c, -x], so that, with the 2x2 matrix C = I + V.T @ inv(M) @ U,
+
+    det(M') = det(M) * det(C)
+    inv(M') = inv(M) - inv(M) @ U @ inv(C) @ V.T @ inv(M)
+    trace(W @ inv(M')) = trace(W @ inv(M)) - trace(inv(C) @ V.T @ inv(M) @ W @ inv(M) @ U)
+
+and all the candidate levels of a coordinate are scored at once from a few matrix-vector products.
+
+Categorical factors (coded 1 and 2 by generate) are recoded to -1 and 1 while exchanging, and their quadratic
+terms, aliased with the intercept, are left out of the model.
+
+Usage:
+
+    A = generate(n_num=6, output="coded")  # 13 runs
+    augmented = augment(A, n_runs=16)  # the 16 new runs, to fit the full quadratic model, follow the original ones
+"""
+
+import os
+
+import numpy as np
+
+from .analysis import _get_terms, _normalize_effects, get_X, get_moment_matrix
+from .design import _get_executor
+from .instrumentation import instrumented
+
+DEFAULT_AUGMENT_EFFECTS = ("intercept", "main", "2-interactions", "quadratic")
+
+
+def _get_kept_columns(n_factors, effects, categorical):
+    """Columns of get_X in the model: all but the quadratic terms of the categorical factors."""
+    names = _get_terms(n_factors, _normalize_effects(effects))[0]
+    squares = {f"X{j + 1}^2" for j in categorical}
+    return np.array([k for k, name in enumerate(names) if name not in squares], dtype=np.intp)
+
+
+def _get_coordinate_terms(n_factors, effects, keep=None):
+    """For each factor j, the terms of get_X that depend on it, as (columns, exponents, others) such that
+    X[:, columns] = x_j ** exponents * prod(x[others], axis=1), with others padded by n_factors (a one).
+    If keep is given, only the columns of get_X in keep are considered, and columns index keep."""
+    names, groups = _get_terms(n_factors, _normalize_effects(effects))
+    factors = np.full((len(names), max(group.shape[1] for group in groups)), n_factors, dtype=np.intp)
+    row = 0
+    for group in groups:
+        factors[row : row + len(group), : group.shape[1]] = group
+        row += len(group)
+
+    position = np.arange(len(names))
+    if keep is not None:
+        position = np.full(len(names), -1)
+        position[keep] = np.arange(len(keep))
+
+    coordinate_terms = []
+    for j in range(n_factors):
+        is_j = factors == j
+        columns = np.flatnonzero(is_j.any(axis=1) & (position >= 0))
+        coordinate_terms.append(
+            (position[columns], is_j[columns].sum(axis=1), np.where(is_j[columns], n_factors, factors[columns]))
+        )
+    return coordinate_terms
+
+
+def _coordinate_exchange(A, n_runs, effects, categorical, criterion, levels, max_passes, ridge, seed):
+    """Optimize @n_runs new runs from a random start, returning them with the exact criterion value
+    (log(det(M)) for 'D', -trace(W @ inv(M)) for 'I', -inf if the model is not estimable).
+    The categorical factors (indexes) are coded -1 and 1, and their quadratic terms are not in the model."""
+    rng = np.random.default_rng(seed)
+    n_factors = A.shape[1]
+    # The last column of ones is the padding of the others in _get_coordinate_terms
+    new = np.ones((n_runs, n_factors + 1))
+    for j in range(n_factors):
+        new[:, j] = rng.choice(levels[j], size=n_runs)
+
+    keep = _get_kept_columns(n_factors, effects, categorical)
+    X0 = get_X(A, effects=effects, dtype=float)[:, keep]
+    Xn = np.ascontiguousarray(get_X(new[:, :n_factors], effects=effects, dtype=float)[:, keep])
+    M0 = X0.T @ X0
+    n_params = M0.shape[0]
+    # The ridge keeps the information matrix invertible when the random start does not estimate the model
+    W = get_moment_matrix(n_factors, effects, categorical)[np.ix_(keep, keep)] if criterion == "I" else None
+    coordinate_terms = _get_coordinate_terms(n_factors, effects, keep)
+
+    for _ in range(max_passes):
+        # Inverted once per pass, so that the rounding errors of the updates do not accumulate
+        Minv = np.linalg.inv(M0 + Xn.T @ Xn + ridge * np.eye(n_params))
+        value = -np.trace(W @ Minv) if criterion == "I" else 0.0
+        improved = False
+        for i in range(n_runs):
+            x = Xn[i]
+            b = Minv @ x
+            d_x = x @ b
+            bW = W @ b if criterion == "I" else None
+            for j in range(n_factors):
+                # Only the terms depending on factor j change: inv(M) @ c = b + inv(M)[:, columns] @ (c - x)[columns]
+                columns, exponents, others = coordinate_terms[j]
+                rest = np.prod(new[i][others], axis=1)
+                delta = levels[j][:, np.newaxis] ** exponents * rest - x[columns]
+                a = b + delta @ Minv[columns]
+                d_xc = d_x + delta @ b[columns]
+                d_c = d_xc + np.einsum("kp,kp->k", a[:, columns], delta)
+                det_C = (1.0 + d_c) * (1.0 - d_x) + d_xc**2
+                if criterion == "D":
+                    gain = np.log(np.maximum(det_C, 1e-300))
+                else:
+                    aW = a @ W
+                    reduction = (
+                        (1.0 - d_x) * np.einsum("kp,kp->k", aW, a) + 2.0 * d_xc * (aW @ b) - (1.0 + d_c) * (b @ bW)
+                    )
+                    with np.errstate(divide="ignore", invalid="ignore"):
+                        gain = np.where(det_C > 1e-12, reduction / det_C, -np.inf)
+                best = int(np.argmax(gain))
+                if not gain[best] > 1e-9 * max(1.0, abs(value)):
+                    continue
+
+                # Rank-two update of the inverse: inv(M) -= [a, b] @ inv(C) @ [a, -b].T
+                C_inverse = np.array([[1.0 - d_x, -d_xc[best]], [d_xc[best], 1.0 + d_c[best]]]) / det_C[best]
+                Minv -= np.column_stack([a[best], b]) @ C_inverse @ np.vstack([a[best], -b])
+                x[columns] += delta[best]
+                new[i, j] = levels[j][best]
+                b = Minv @ x
+                d_x = x @ b
+                bW = W @ b if criterion == "I" else None
+                value += gain[best]
+                improved = True
+        if not improved:
+            break
+
+    M = M0 + Xn.T @ Xn
+    if criterion == "D":
+        sign, log_det = np.linalg.slogdet(M)
+        score = log_det if sign > 0 else -np.inf
+    else:
+        try:
+            score = -np.trace(W @ np.linalg.inv(M)) if np.linalg.matrix_rank(M) == n_params else -np.inf
+        except np.linalg.LinAlgError:
+            score = -np.inf
+    return new[:, :n_factors], score
+
+
+@instrumented("augment")
+def augment(
+    A,
+    n_runs,
+    effects=DEFAULT_AUGMENT_EFFECTS,
+    criterion="D",
+    levels=None,
+    n_starts=8,
+    max_passes=50,
+    ridge=1e-6,
+    seed=0,
+    executor="process",
+    max_workers=None,
+):
+    """Add @n_runs runs to a coded design, choosing their levels to maximize the D- or I-optimality of the
+    model, e.g., to follow up a DSD with the runs needed to fit the full quadratic model.
+
+    INPUTS
+
+        A (numpy.array)
+            Coded design to augment, e.g., generate(..., output="coded"). The columns whose values are all
+            1 or 2 are the categorical factors: their quadratic terms are left out of the model.
+
+        n_runs (int)
+            Number of runs to add.
+
+        effects (tuple of str)
+            Terms of the model to optimize for (see analysis.get_X). Default is the full quadratic model.
+
+        criterion (str)
+            'D' to maximize det(X.T @ X) or 'I' to minimize the average prediction variance in [-1, 1]^k.
+
+        levels (list of array-like)
+            Levels allowed for each factor, coded as in A. By default, the levels already used by each column
+            of A.
+
+        n_starts (int)
+            Number of random starts: the best augmented design is returned.
+
+        max_passes (int)
+            Maximum number of passes over all the coordinates of the new runs, for each start.
+
+        ridge (float)
+            Added to the diagonal of X.T @ X while exchanging, so that random starts that do not estimate the
+            model can still be improved. The final designs are compared without it.
+
+        seed (int)
+            Seed of the random starts.
+
+        executor (str or concurrent.futures.Executor)
+            'process' or 'thread' for a new pool of max_workers running the starts in parallel,
+            an existing Executor, or None to run them in the current thread.
+
+        max_workers (int)
+            Number of workers of the new pool (default of concurrent.futures if None).
+
+    OUTPUTS
+
+        augmented (numpy.array)
+            The runs of A followed by the n_runs new runs, coded as A and of its type (e.g., int8), unless
+            the type cannot represent the levels (e.g., 0.5 for an integer design), then float64.
+
+    Raise ValueError if no start estimates the model, e.g., if the levels cannot separate some terms.
+
+    """
+    dtype = np.asarray(A).dtype
+    A = np.asarray(A, dtype=float)
+    # Categorical factors are recoded from 1 and 2 to -1 and 1, as in response._code_design
+    is_cat = np.array([np.isin(A[:, j], [1.0, 2.0]).all() for j in range(A.shape[1])], dtype=bool)
+    categorical = tuple(int(j) for j in np.flatnonzero(is_cat))
+    if criterion not in ["D", "I"]:
+        raise ValueError(f"Criterion `{criterion}` must be 'D' or 'I'")
+    if n_runs < 1:
+        raise ValueError(f"The number of runs to add must be positive: {n_runs}")
+    if levels is None:
+        levels = [np.unique(A[:, j]) for j in range(A.shape[1])]
+    levels = [np.asarray(factor_levels, dtype=float) for factor_levels in levels]
+    if len(levels) != A.shape[1]:
+        raise ValueError(f"Levels are given for {len(levels)} factors, but the design has {A.shape[1]}")
+    levels = [2.0 * levels[j] - 3.0 if is_cat[j] else levels[j] for j in range(A.shape[1])]
+    coded = np.where(is_cat, 2.0 * A - 3.0, A)
+
+    effects = tuple(effects)
+    n_params = len(_get_kept_columns(A.shape[1], effects, categorical))
+    if len(A) + n_runs < n_params:
+        raise ValueError(
+            f"At least {n_params - len(A)} runs must be added to estimate the {n_params} terms of the model"
+        )
+    seeds = np.random.SeedSequence(seed).spawn(n_starts)
+    args = (coded, n_runs, effects, categorical, criterion, levels, max_passes, ridge)
+
+    if executor is None:
+        results = [_coordinate_exchange(*args, start_seed) for start_seed in seeds]
+    else:
+        if executor == "process" and max_workers is None:
+            max_workers = min(n_starts, os.cpu_count() or 1)
+        with _get_executor(executor, max_workers) as pool:
+            futures = [pool.submit(_coordinate_exchange, *args, start_seed) for start_seed in seeds]
+            results = [future.result() for future in futures]
+
+    new, score = max(results, key=lambda result: result[1])
+    if score == -np.inf:
+        raise ValueError(
+            f"None of the {n_starts} starts estimates the {n_params} terms of the model with the allowed levels"
+        )
+    augmented = np.vstack([A, np.where(is_cat, (new + 3.0) / 2.0, new)])
+    # In the type of A (e.g., int8 coded), unless it cannot represent the allowed levels
+    typed = augmented.astype(dtype)
+    return typed if (typed == augmented).all() else augmented
@@ -0,0 +1,157 @@
+"""Prebuilt on-disk catalog of coded designs, loaded lazily through a memory map.
+
+A catalog is a single binary file: an 8-bytes magic string, the length of a JSON header (uint64, little-endian),
+the JSON header listing every design with its offset, shape and CRC-32 checksum, and finally the coded designs
+stored back to back as int8 arrays (row-major). The header also records the version of the constructions that
+built the designs (CONSTRUCTION_VERSION): a catalog built by other constructions is rejected when opened.
+
+Usage:
+
+    build_catalog("dsd_catalog.bin")  # every nctn=3:30, ncat=0:30, designChoice='dsd'/'orth'
+    generate(n_num=12, n_cat=3, catalog="dsd_catalog.bin")
+"""
+
+import json
+import os
+import zlib
+from functools import lru_cache
+
+import numpy as np
+
+from ._generalized_dsd import CONSTRUCTION_VERSION, _build_dsd, get_n_runs
+from .instrumentation import cached_call
+
+MAGIC = b"DSDCAT01"
+FORMAT_VERSION = 1
+_HEADER_SIZE_DTYPE = np.dtype("<u8")
+
+
+def build_catalog(path, n_num=range(3, 31), n_cat=range(0, 31), methods=("dsd", "orth")):
+    """Precompute the coded designs for every combination of continuous factors (n_num), categorical
+    factors (n_cat) and design choice (methods), and write them into a single catalog file at @path.
+
+    The default ranges are the 1736 permutations validated against JMP (see _compute_dsd).
+    Each design is written as soon as it is built, into a temporary file replacing @path at the end: a catalog
+    opened meanwhile, e.g., by generate, keeps reading the previous file.
+    Return the number of designs written.
+    """
+    # The offsets and shapes are known beforehand, but not the checksums: the header is written after the designs,
+    # in the space reserved for the largest checksums (JSON ignores the trailing spaces)
+    entries = []
+    offset = 0
+    for method in methods:
+        for nctn in n_num:
+            for ncat in n_cat:
+                if nctn + ncat == 0:
+                    continue
+                shape = (get_n_runs(int(nctn), int(ncat), method), int(nctn) + int(ncat))
+                entries.append([int(nctn), int(ncat), method, offset, shape[0], shape[1], 0xFFFFFFFF])
+                offset += shape[0] * shape[1]
+    header_size = len(_encode_header(entries))
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as fh:
+            fh.seek(len(MAGIC) + _HEADER_SIZE_DTYPE.itemsize + header_size)
+            for entry in entries:
+                nctn, ncat, method, _, nrows, ncols, _ = entry
+                coded = np.ascontiguousarray(_build_dsd(nctn, ncat, method), dtype=np.int8)
+                assert coded.shape == (nrows, ncols), f"Design {(nctn, ncat, method)} has not {nrows} runs"
+                entry[6] = zlib.crc32(coded)
+                fh.write(coded.tobytes())
+            fh.seek(0)
+            fh.write(MAGIC)
+            fh.write(np.array(header_size, dtype=_HEADER_SIZE_DTYPE).tobytes())
+            fh.write(_encode_header(entries).ljust(header_size))
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    _open_catalog.cache_clear()
+
+    return len(entries)
+
+
+def _encode_header(entries):
+    header = {"version": FORMAT_VERSION, "construction": CONSTRUCTION_VERSION, "entries": entries}
+    return json.dumps(header, separators=(",", ":")).encode("utf-8")
+
+
+class DesignCatalog:
+    """Read-only access to a catalog file written by build_catalog.
+
+    Only the header is parsed when opening: the designs are memory-mapped and each one is read, and its
+    checksum verified, the first time it is requested.
+    """
+
+    def __init__(self, path, verify=True):
+        self.path = str(path)
+        self.verify = verify
+        with open(self.path, "rb") as fh:
+            if fh.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"File `{self.path}` is not a design catalog.")
+            header_size = int(np.frombuffer(fh.read(_HEADER_SIZE_DTYPE.itemsize), dtype=_HEADER_SIZE_DTYPE)[0])
+            header = json.loads(fh.read(header_size).decode("utf-8"))
+        if header.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Catalog `{self.path}` has format version {header.get('version')}, not {FORMAT_VERSION}.")
+        if header.get("construction") != CONSTRUCTION_VERSION:
+            raise ValueError(
+                f"Catalog `{self.path}` was built by the constructions version {header.get('construction')}, "
+                f"not {CONSTRUCTION_VERSION}: its designs may differ from the computed ones, rebuild it with build_catalog."
+            )
+        data_offset = len(MAGIC) + _HEADER_SIZE_DTYPE.itemsize + header_size
+
+        self._entries = {}
+        data_size = 0
+        for nctn, ncat, method, offset, nrows, ncols, crc in header["entries"]:
+            self._entries[(nctn, ncat, method)] = (offset, (nrows, ncols), crc)
+            data_size = max(data_size, offset + nrows * ncols)
+        if data_size > 0:
+            self._data = np.memmap(self.path, dtype=np.int8, mode="r", offset=data_offset, shape=(data_size,))
+        else:
+            self._data = np.zeros(0, dtype=np.int8)
+        self._verified = set()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def keys(self):
+        """Return the (nctn, ncat, method) combinations stored in the catalog."""
+        return self._entries.keys()
+
+    def get(self, nctn, ncat=0, method="dsd"):
+        """Return the coded design as a read-only int8 view on the memory map, or None if not in the catalog."""
+        key = (nctn, ncat, method)
+        if key not in self._entries:
+            return None
+        offset, shape, crc = self._entries[key]
+        coded = np.asarray(self._data[offset : offset + shape[0] * shape[1]]).reshape(shape)
+        if self.verify and key not in self._verified:
+            self._check(key, coded, crc)
+        return coded
+
+    def verify_all(self):
+        """Check the checksum of every design, raising ValueError at the first corrupted one."""
+        for key, (offset, shape, crc) in self._entries.items():
+            self._check(key, self._data[offset : offset + shape[0] * shape[1]], crc)
+
+    def _check(self, key, coded, crc):
+        if zlib.crc32(coded.tobytes()) != crc:
+            raise ValueError(f"Checksum mismatch for design {key} in catalog `{self.path}`.")
+        self._verified.add(key)
+
+
+def open_catalog(path):
+    """Open a catalog file once per process, until it is rebuilt, and return the shared DesignCatalog."""
+    stat = os.stat(path)
+    return cached_call("catalog_files", _open_catalog, str(path), stat.st_ino, stat.st_mtime_ns)
+
+
+@lru_cache(maxsize=8)
+def _open_catalog(path, st_ino, st_mtime_ns):
+    """DesignCatalog of @path, cached per version of the file (its inode and modification time)."""
+    return DesignCatalog(path)
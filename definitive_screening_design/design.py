@@ -1,13 +1,52 @@
 """Main function to generate a Definitive Screening design."""
-import numpy as np
-import pandas as pd
+import os
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from itertools import islice
 
-from ._generalized_dsd import _compute_dsd
+from ._generalized_dsd import (  # noqa: F401
+    _compute_dsd,
+    clear_design_cache,
+    design_cache_info,
+    get_n_runs as _get_n_runs,
+    set_design_cache_size,
+)
+from .catalog import DesignCatalog, open_catalog
+from .instrumentation import count, instrumented
+from .runsheet import OUTPUTS, RunSheet, format_coded, is_categorical
 
+BATCH_DEDUP_SIZE = 65536  # Number of distinct specifications remembered by generate_batch to skip duplicates
 
+
+def _get_n_fake_factors(n_num, n_cat, min_13, n_fake_factors):
+    """Number of fake factors actually used, augmenting small designs to at least 13 trials if min_13."""
+    if min_13 and (n_num + n_cat + n_fake_factors) < 6:
+        return 6 - (n_num + n_cat)
+    return n_fake_factors
+
+
+def get_n_runs(n_num=0, n_cat=0, method="dsd", min_13=True, n_fake_factors=0):
+    """Return the number of trials that generate would produce for the same inputs, without building the design.
+
+    This is a cheap query (no matrix is constructed) meant for sizing experiments.
+    """
+    assert n_num + n_cat > 0, "You need to specify at least n_num>0 or n_cat>0."
+    n_fake_factors = _get_n_fake_factors(n_num, n_cat, min_13, n_fake_factors)
+    return _get_n_runs(n_num + n_fake_factors, n_cat, method)
+
+
+@instrumented("generate")
 def generate(
-    n_num=0, n_cat=0, factors_dict=None, method="dsd", min_13=True, n_fake_factors=0, verbose=True
-) -> pd.DataFrame:
+    n_num=0,
+    n_cat=0,
+    factors_dict=None,
+    method="dsd",
+    min_13=True,
+    n_fake_factors=0,
+    verbose=True,
+    catalog=None,
+    output="dataframe",
+):
     """Generate DSD with 2-levels categoricals design from calculation (Jones 2013).
 
     INPUTS
@@ -43,14 +82,33 @@ def generate(
         verbose (bool)
             If True print info.
 
+        catalog (str or DesignCatalog)
+            Prebuilt catalog of coded designs (see catalog.build_catalog) to look the design up from,
+            instead of computing it. Designs missing from the catalog are computed as usual.
+
+        output (str)
+            Format of the result:
+                'dataframe' -> pandas.DataFrame with the actual values of the factors (default),
+                'coded' -> numpy.array (int8) with -1, 0, 1 for numerical and 1, 2 for categorical factors
+                           (convert it to float, e.g., with .astype(float), before matrix products),
+                'codes' -> numpy.array (int8) with the index of the level of each factor:
+                           0, 1, 2 for low, mid, high numerical values and 0, 1 for categoricals,
+                'structured' -> numpy structured array with the actual values, one field per factor,
+                'run_sheet' -> runsheet.RunSheet with the coded design (int8) and factors_dict, to be saved
+                               to a compact binary file and loaded back with runsheet.load_run_sheet.
+            In all cases the columns follow the order of factors_dict and fake factors are dropped.
+
     OUTPUTS
 
         dsd_df (pandas.DataFrame)
             Table with DSD trials. Order is not randomized.
+            See the output input for the other available formats.
 
     """
 
     assert n_num + n_cat > 0 or factors_dict is not None, "You need to specify at least n_num>0 or n_cat>0."
+    if output not in OUTPUTS + ("run_sheet",):
+        raise ValueError(f"Output `{output}` must be 'dataframe', 'coded', 'codes', 'structured' or 'run_sheet'")
 
     num_nms, cat_nms = [], []
     if factors_dict is None:
@@ -69,7 +127,7 @@ def generate(
         for factor_nm, factor_range in factors_dict.items():
             if len(factor_range) != 2:
                 raise ValueError(f"Factor `{factor_nm}` has not two range values: {factor_range}")
-            if isinstance(factor_range[0], bool) or isinstance(factor_range[0], str):
+            if is_categorical(factor_range):
                 cat_nms.append(factor_nm)
             else:
                 num_nms.append(factor_nm)
@@ -80,35 +138,133 @@ def generate(
                 f"Generating a Definitive Screening Design from factors dictionary: {n_num} numerical and {n_cat} categorical."
             )
 
-    if min_13 and (n_num + n_cat + n_fake_factors) < 6:
-        n_fake_factors = 6 - (n_num + n_cat)
-
-    dsd_array = _compute_dsd(n_num + n_fake_factors, n_cat, method)
-
-    dsd_df = pd.DataFrame()
-    for i, factor_nm in enumerate(num_nms):
-        dsd_df[factor_nm] = dsd_array[:, i]
-        dsd_df[factor_nm] = dsd_df[factor_nm].replace(
-            {
-                -1.0: factors_dict[factor_nm][0],
-                0.0: np.mean(factors_dict[factor_nm]),
-                +1.0: factors_dict[factor_nm][1],
-            }
-        )
+    n_fake_factors = _get_n_fake_factors(n_num, n_cat, min_13, n_fake_factors)
+
+    dsd_array = None
+    if catalog is not None:
+        if not isinstance(catalog, DesignCatalog):
+            catalog = open_catalog(str(catalog))
+        dsd_array = catalog.get(n_num + n_fake_factors, n_cat, method)
+        count("catalog.misses" if dsd_array is None else "catalog.hits")
+    if dsd_array is None:
+        dsd_array = _compute_dsd(n_num + n_fake_factors, n_cat, method)
+
+    # Column of each factor in the coded design, in the original order of factors_dict.
     # NOTE: fake factors are skipped
-    for i, factor_nm in enumerate(cat_nms):
-        dsd_df[factor_nm] = dsd_array[:, -len(cat_nms) + i]
-        dsd_df[factor_nm] = dsd_df[factor_nm].replace(
-            {
-                1: factors_dict[factor_nm][0],
-                2: factors_dict[factor_nm][1],
-            }
-        )
-
-    # Restore original order of columns
-    dsd_df = dsd_df[list(factors_dict.keys())]
-
-    # Set indexes to 1-to-N range (instead of 0-to-(N-1))
-    dsd_df.index = range(1, len(dsd_df) + 1)
-
-    return dsd_df
+    nf = dsd_array.shape[1]
+    factor_nms = list(factors_dict.keys())
+    column_of = {nm: i for i, nm in enumerate(num_nms)}
+    column_of.update({nm: nf - n_cat + i for i, nm in enumerate(cat_nms)})
+    columns = [column_of[nm] for nm in factor_nms]
+    coded = dsd_array[:, columns]
+
+    if output == "run_sheet":
+        return RunSheet(coded, factors_dict, method)
+    return format_coded(coded, factors_dict, output)
+
+
+def _freeze_spec(spec):
+    """Hashable key of a generate specification, used to detect duplicates."""
+    key = []
+    for name, value in sorted(spec.items()):
+        if isinstance(value, dict):
+            value = tuple((k, tuple(v)) for k, v in value.items())
+        key.append((name, value))
+    return tuple(key)
+
+
+@contextmanager
+def _get_executor(executor, max_workers=None):
+    """Yield the concurrent.futures.Executor of an @executor argument: a new pool of @max_workers for 'process' or
+    'thread', shut down on exit, or the given Executor."""
+    from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+    if executor == "process":
+        pool = ProcessPoolExecutor(max_workers=max_workers)
+    elif executor == "thread":
+        pool = ThreadPoolExecutor(max_workers=max_workers)
+    elif isinstance(executor, Executor):
+        yield executor
+        return
+    else:
+        raise ValueError(f"Executor `{executor}` must be 'process', 'thread', None or a concurrent.futures.Executor")
+    try:
+        yield pool
+    finally:
+        pool.shutdown(wait=True)
+
+
+def _generate_spec(spec):
+    return generate(**{"verbose": False, **spec})
+
+
+def generate_batch(specs, executor="process", max_workers=None, ordered=True, max_pending=None):
+    """Generate a design for each specification, distributing the work over a pool of workers.
+
+    INPUTS
+
+        specs (iterable of dict)
+            Keyword arguments of generate for each design, e.g., [{"n_num": 5}, {"n_num": 5, "n_cat": 2}, ...].
+            It can be a lazy iterator: it is consumed only as workers become available.
+            Duplicate specifications are computed and yielded only once, among the BATCH_DEDUP_SIZE (65536)
+            most recently seen distinct ones, so that the memory used is bounded for unbounded iterators.
+            verbose is False unless specified.
+
+        executor (str or concurrent.futures.Executor)
+            'process' or 'thread' for a new pool of max_workers, an existing Executor, or None to generate
+            in the current thread.
+
+        max_workers (int)
+            Number of workers of the new pool (default of concurrent.futures if None).
+
+        ordered (bool)
+            If True yield the results in the order of specs, otherwise as soon as they are completed.
+
+        max_pending (int)
+            Maximum number of submitted specifications whose result has not been yielded yet, which bounds
+            the memory used for large grids. Default is twice the number of workers.
+
+    OUTPUTS
+
+        Generator of (spec, design) tuples, with design as returned by generate(**spec).
+
+    """
+    from concurrent.futures import FIRST_COMPLETED, wait
+
+    seen = OrderedDict()  # Least recently seen first
+
+    def unique_specs():
+        for spec in specs:
+            key = _freeze_spec(spec)
+            if key in seen:
+                seen.move_to_end(key)
+                continue
+            seen[key] = None
+            if len(seen) > BATCH_DEDUP_SIZE:
+                seen.popitem(last=False)
+            yield spec
+
+    specs_iter = unique_specs()
+
+    if executor is None:
+        for spec in specs_iter:
+            yield spec, _generate_spec(spec)
+        return
+
+    if max_pending is None:
+        max_pending = 2 * (max_workers or os.cpu_count() or 1)
+
+    with _get_executor(executor, max_workers) as pool:
+        submit = pool.submit
+        pending = deque((submit(_generate_spec, spec), spec) for spec in islice(specs_iter, max_pending))
+        while pending:
+            if ordered:
+                future, spec = pending.popleft()
+                yield spec, future.result()
+            else:
+                done, _ = wait([future for future, _ in pending], return_when=FIRST_COMPLETED)
+                for future, spec in [item for item in pending if item[0] in done]:
+                    pending.remove((future, spec))
+                    yield spec, future.result()
+            for spec in islice(specs_iter, max_pending - len(pending)):
+                pending.append((submit(_generate_spec, spec), spec))
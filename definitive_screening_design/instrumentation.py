@@ -0,0 +1,191 @@
+"""Opt-in instrumentation of the design generation and analysis stages.
+
+Within ``instrument()``, every named stage records its number of calls, wall time and the bytes of the arrays it
+produces, and the caches count their hits and misses. Outside of it, each instrumented stage costs a single check
+of an empty list.
+
+Usage:
+
+    with instrument() as metrics:
+        generate(n_num=20, n_cat=2)
+    metrics.to_dict()  # e.g., to export to a monitoring service
+    metrics.to_dataframe()
+
+    with instrument(callback=lambda name, elapsed, nbytes: statsd.timing(name, elapsed * 1e3)):
+        ...  # each stage is also reported when it ends
+
+Stage times are inclusive of the nested stages (e.g., 'dsd.conference_matrix' within 'dsd.build').
+Stages that run in other processes (e.g., generate_batch(executor='process')) are not recorded.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+_collectors = []  # Metrics of the active instrument() contexts, empty when instrumentation is disabled
+
+
+class Metrics:
+    """Calls, wall time and allocated bytes per stage, and counters, collected by instrument()."""
+
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.stages = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def _record(self, name, elapsed, nbytes):
+        with self._lock:
+            stage = self.stages.setdefault(name, {"Calls": 0, "Time (s)": 0.0, "Allocated (bytes)": 0})
+            stage["Calls"] += 1
+            stage["Time (s)"] += elapsed
+            stage["Allocated (bytes)"] += nbytes
+        if self.callback is not None:
+            self.callback(name, elapsed, nbytes)
+
+    def _count(self, name, n):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def cache_hit_rates(self):
+        """Return {cache: hits / (hits + misses)} for the caches used while instrumented."""
+        caches = {name.rsplit(".", 1)[0] for name in self.counters if name.endswith((".hits", ".misses"))}
+        rates = {}
+        for cache in sorted(caches):
+            hits = self.counters.get(f"{cache}.hits", 0)
+            rates[cache] = hits / (hits + self.counters.get(f"{cache}.misses", 0))
+        return rates
+
+    def to_dict(self):
+        """Return the metrics as plain dicts (JSON serializable)."""
+        with self._lock:
+            return {
+                "Stages": {name: dict(stage) for name, stage in self.stages.items()},
+                "Counters": dict(self.counters),
+                "Cache Hit Rates": self.cache_hit_rates(),
+            }
+
+    def to_dataframe(self):
+        """Return the stages as a pandas.DataFrame, one row per stage, slowest first."""
+        import pandas as pd
+
+        df = pd.DataFrame.from_dict(self.to_dict()["Stages"], orient="index", columns=_STAGE_COLUMNS)
+        df.index.name = "Stage"
+        return df.sort_values("Time (s)", ascending=False)
+
+
+_STAGE_COLUMNS = ["Calls", "Time (s)", "Allocated (bytes)"]
+
+
+@contextmanager
+def instrument(callback=None):
+    """Record the stages run in this context (in any thread), yielding their Metrics.
+
+    Inputs:
+        callback: optional function called as callback(name, elapsed, nbytes) at the end of each stage
+
+    Outputs:
+        metrics (Metrics): filled while the context is active, e.g., metrics.to_dict() after it
+    """
+    metrics = Metrics(callback)
+    _collectors.append(metrics)
+    try:
+        yield metrics
+    finally:
+        _collectors.remove(metrics)
+
+
+def is_enabled():
+    """Return True within an instrument() context."""
+    return bool(_collectors)
+
+
+class _Stage:
+    __slots__ = ("name", "nbytes", "start")
+
+    def __init__(self, name):
+        self.name = name
+        self.nbytes = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.start
+        for metrics in list(_collectors):
+            metrics._record(self.name, elapsed, self.nbytes)
+        return False
+
+    def add_bytes(self, result):
+        """Count the bytes of the arrays (or tuple, dict or pandas object of arrays) produced by the stage."""
+        self.nbytes += _get_nbytes(result)
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def add_bytes(self, result):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+def stage(name):
+    """Context manager timing the stage @name, a no-op when instrumentation is disabled."""
+    if not _collectors:
+        return _NULL_STAGE
+    return _Stage(name)
+
+
+def instrumented(name):
+    """Decorator recording each call of a function as the stage @name, with the bytes of its result."""
+
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _collectors:
+                return function(*args, **kwargs)
+            with _Stage(name) as timed_stage:
+                result = function(*args, **kwargs)
+                timed_stage.add_bytes(result)
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+def count(name, n=1):
+    """Add @n to the counter @name, if instrumentation is enabled."""
+    for metrics in list(_collectors):
+        metrics._count(name, n)
+
+
+def cached_call(name, cached_function, *args):
+    """Call a functools.lru_cache function, counting '@name.hits' or '@name.misses' if instrumentation is enabled."""
+    if not _collectors:
+        return cached_function(*args)
+    hits = cached_function.cache_info().hits
+    result = cached_function(*args)
+    # Another thread may hit the cache meanwhile: the counts are then approximate
+    count(f"{name}.hits" if cached_function.cache_info().hits > hits else f"{name}.misses")
+    return result
+
+
+def _get_nbytes(result):
+    if isinstance(result, (tuple, list)):
+        return sum(_get_nbytes(item) for item in result)
+    if isinstance(result, dict):
+        return sum(_get_nbytes(item) for item in result.values())
+    if hasattr(result, "memory_usage"):  # pandas
+        return int(result.memory_usage(index=True).sum()) if hasattr(result, "columns") else result.memory_usage()
+    return int(getattr(result, "nbytes", 0))
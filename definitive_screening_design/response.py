@@ -0,0 +1,438 @@
+"""Analysis of the responses measured on a Definitive Screening design.
+
+A DSD is made of foldover pairs of runs (x, -x) and center runs: main effects are odd functions of x and
+second-order terms (two-factor interactions and quadratics) are even ones, so that splitting each response in
+its odd part, (y(x) - y(-x)) / 2 for both runs of a pair and 0 for center runs, and its even part, the rest,
+separates the estimation of the main effects from the one of the second-order terms.
+"""
+
+import math
+from functools import lru_cache
+
+import numpy as np
+
+from .analysis import _get_term_columns, _parse_term, get_X
+from .instrumentation import instrumented
+
+_lgamma = np.vectorize(math.lgamma, otypes=[float])
+
+
+def _betainc(a, b, x, max_iter=300, eps=1e-14):
+    """Regularized incomplete beta function I_x(a, b), evaluated elementwise by its continued fraction
+    (modified Lentz method), using the symmetry I_x(a, b) = 1 - I_(1-x)(b, a) where it converges faster."""
+    a, b, x = np.broadcast_arrays(*(np.asarray(value, dtype=float) for value in (a, b, x)))
+    swap = x > (a + 1.0) / (a + b + 2.0)
+    a, b, x = np.where(swap, b, a), np.where(swap, a, b), np.clip(np.where(swap, 1.0 - x, x), 0.0, 1.0)
+    tiny = 1e-300
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        log_front = _lgamma(a + b) - _lgamma(a) - _lgamma(b) + a * np.log(x) + b * np.log1p(-x)
+        c = np.ones_like(x)
+        d = 1.0 - (a + b) * x / (a + 1.0)
+        d = 1.0 / np.where(np.abs(d) < tiny, tiny, d)
+        h = d.copy()
+        for m in range(1, max_iter + 1):
+            for numerator in (
+                m * (b - m) * x / ((a + 2 * m - 1.0) * (a + 2 * m)),
+                -(a + m) * (a + b + m) * x / ((a + 2 * m) * (a + 2 * m + 1.0)),
+            ):
+                d = 1.0 + numerator * d
+                d = 1.0 / np.where(np.abs(d) < tiny, tiny, d)
+                c = 1.0 + numerator / c
+                c = np.where(np.abs(c) < tiny, tiny, c)
+                h *= c * d
+            if np.all(np.abs(c * d - 1.0) < eps):
+                break
+        result = np.where(x > 0.0, np.exp(log_front) * h / a, 0.0)
+    return np.where(swap, 1.0 - result, result)
+
+
+def _f_sf(F, df1, df2):
+    """Survival function (p-value) of the F distribution with df1 and df2 degrees of freedom.
+    The two-sided p-value of a t statistic with df degrees of freedom is _f_sf(t**2, 1, df)."""
+    F, df1, df2 = np.broadcast_arrays(*(np.asarray(value, dtype=float) for value in (F, df1, df2)))
+    valid = (df1 > 0) & (df2 > 0) & ~np.isnan(F)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x = np.where(valid, df2 / (df2 + df1 * np.maximum(F, 0.0)), 0.5)
+        p = _betainc(np.where(valid, df2 / 2.0, 1.0), np.where(valid, df1 / 2.0, 1.0), x)
+    return np.where(valid, p, np.nan)
+
+
+@lru_cache(maxsize=None)
+def _f_isf(alpha, df1, df2):
+    """Critical value of the F distribution, i.e., F such that _f_sf(F, df1, df2) = alpha, found by bisection."""
+    low, high = 0.0, 1.0
+    while _f_sf(high, df1, df2) > alpha:
+        low, high = high, 2.0 * high
+    while high - low > 1e-12 * high:
+        middle = (low + high) / 2.0
+        if _f_sf(middle, df1, df2) > alpha:
+            low = middle
+        else:
+            high = middle
+    return (low + high) / 2.0
+
+
+def _code_design(A):
+    """Coded design as floats, with the categorical columns (coded 1 and 2 by generate) recoded to -1 and 1."""
+    A = np.array(A, dtype=float) + 0.0  # no -0.0
+    for j in range(A.shape[1]):
+        if np.isin(A[:, j], [1.0, 2.0]).all():
+            A[:, j] = 2.0 * A[:, j] - 3.0
+    return A
+
+
+def _get_foldover_pairs(A):
+    """Indexes of the runs (first, second) forming foldover pairs, second = -first, and of the center runs.
+    Raise ValueError if some run has no mirror image, e.g., for 'orth' designs with categorical factors."""
+    unmatched = {}
+    first, second, centers = [], [], []
+    for i, row in enumerate(A):
+        if not row.any():
+            centers.append(i)
+            continue
+        mirrors = unmatched.get((0.0 - row).tobytes())  # not -row, which has -0.0 for the zeros
+        if mirrors:
+            first.append(mirrors.pop())
+            second.append(i)
+        else:
+            unmatched.setdefault(row.tobytes(), []).append(i)
+    n_unmatched = sum(len(rows) for rows in unmatched.values())
+    if n_unmatched > 0:
+        raise ValueError(f"The design is not a foldover design: {n_unmatched} runs have no mirror image.")
+    return np.array(first, dtype=np.intp), np.array(second, dtype=np.intp), np.array(centers, dtype=np.intp)
+
+
+def _get_second_order_terms(active, is_categorical, factor_names, heredity):
+    """Candidate second-order terms for the active main effects, as (names, pairs of factor indexes)."""
+    n_factors = len(factor_names)
+    pairs = []
+    for i in range(n_factors):
+        for j in range(i + 1, n_factors):
+            if (active[i] and active[j]) or (heredity == "weak" and (active[i] or active[j])):
+                pairs.append((i, j))
+    pairs += [(i, i) for i in range(n_factors) if active[i] and not is_categorical[i]]
+    names = [f"{factor_names[i]}*{factor_names[j]}" if i != j else f"{factor_names[i]}^2" for i, j in pairs]
+    return names, np.array(pairs, dtype=np.intp).reshape(-1, 2)
+
+
+def _get_all_terms(is_categorical, factor_names):
+    """Names of all the terms that fit_definitive_screening can select."""
+    all_active = np.ones(len(factor_names), dtype=bool)
+    return ["(1)"] + list(factor_names) + _get_second_order_terms(all_active, is_categorical, factor_names, "strong")[0]
+
+
+@instrumented("response.fit_definitive_screening")
+def fit_definitive_screening(
+    A,
+    Y,
+    factor_names=None,
+    response_names=None,
+    alpha_main=0.05,
+    alpha_second=0.05,
+    heredity="strong",
+):
+    """Select and fit a model for each response with the two-stage procedure of Jones and Nachtsheim (2017),
+    "Effective design-based model selection for definitive screening designs", Technometrics 59(3).
+
+    Stage 1 regresses the odd part of the responses on the main effects, for all the responses at once.
+    The error variance is estimated from the odd residuals when the design has more foldover pairs than factors
+    (e.g., using n_fake_factors in generate), otherwise from Lenth's pseudo standard error of the main effects.
+    The main effects with p-value < alpha_main are active, and the error variance is estimated again pooling the
+    inactive ones.
+
+    Stage 2 regresses the even part of each response on the intercept and on the second-order terms of the
+    active factors, adding by forward selection the term reducing most the residual sum of squares as long as
+    the residual mean square is significantly larger than the error variance (F-test at alpha_second).
+
+    Only the few terms of the active factors are searched, and the selected terms are finally fitted together by
+    ordinary least squares, which coincides with the separate fits because odd and even terms are orthogonal.
+
+    Inputs:
+
+        A (numpy.array)
+            Coded design, e.g., generate(..., output="coded"). It must be a foldover design with center runs,
+            as the 'dsd' designs. Categorical factors, coded 1 and 2, are recoded to -1 and 1.
+
+        Y (numpy.array or pandas.DataFrame)
+            Responses, one column for each (or a vector for a single response), with the runs in the order of A.
+
+        factor_names (list of str)
+            Names of the factors, default X1, X2, ... as in get_X.
+
+        response_names (list of str)
+            Names of the responses, default the columns of a DataFrame or Y1, Y2, ...
+
+        heredity (str)
+            'strong' to consider only the interactions between two active factors,
+            'weak' to consider also those between an active and an inactive factor.
+
+    Outputs:
+
+        fit (dict)
+            "Parameter Estimates": pandas.DataFrame with one row for each selected term of each response,
+                with "Estimate", "Std Error", "t Ratio" and "Prob>|t|" of the final least squares fit.
+            "Coefficients": pandas.DataFrame of the estimates with the terms as rows and responses as columns,
+                0 for the terms that were not selected.
+            "Summary": pandas.DataFrame with one row for each response.
+    """
+    import pandas as pd
+
+    if heredity not in ["strong", "weak"]:
+        raise ValueError(f"Heredity `{heredity}` must be 'strong' or 'weak'")
+
+    A = _code_design(A)
+    n_trials, n_factors = A.shape
+    if factor_names is None:
+        factor_names = [f"X{i + 1}" for i in range(n_factors)]
+    if response_names is None:
+        response_names = list(Y.columns) if hasattr(Y, "columns") else None
+    Y = np.asarray(Y, dtype=float)
+    if Y.ndim == 1:
+        Y = Y[:, np.newaxis]
+        response_names = response_names or ["Y"]
+    if response_names is None:
+        response_names = [f"Y{k + 1}" for k in range(Y.shape[1])]
+    if Y.shape[0] != n_trials:
+        raise ValueError(f"The responses have {Y.shape[0]} runs, but the design has {n_trials}")
+    is_categorical = np.all(np.abs(A) == 1.0, axis=0)
+
+    # Odd and even parts of the responses
+    first, second, centers = _get_foldover_pairs(A)
+    Y_odd = np.zeros_like(Y)
+    Y_odd[first] = (Y[first] - Y[second]) / 2.0
+    Y_odd[second] = -Y_odd[first]
+    Y_even = Y - Y_odd
+    n_even = len(first) + len(centers)  # dimension of the space of the even parts, as of the odd ones for pairs
+
+    # Stage 1: main effects, for all the responses at once
+    main, _, rank, _ = np.linalg.lstsq(A, Y_odd, rcond=None)
+    if rank < n_factors:
+        raise np.linalg.LinAlgError("The main effects are not estimable: rank deficient design")
+    variance_factor = np.diag(np.linalg.inv(A.T @ A))[:, np.newaxis]
+    df_odd = len(first) - n_factors
+    if df_odd > 0:
+        error_variance = (np.sum(Y_odd**2, axis=0) - np.sum((A @ main) * Y_odd, axis=0)) / df_odd
+        p_main = _f_sf(main**2 / (variance_factor * error_variance), 1, df_odd)
+    else:
+        contrasts = np.abs(main / np.sqrt(variance_factor))
+        s0 = 1.5 * np.median(contrasts, axis=0)
+        pseudo_standard_error = 1.5 * np.nanmedian(np.where(contrasts < 2.5 * s0, contrasts, np.nan), axis=0)
+        p_main = _f_sf((contrasts / pseudo_standard_error) ** 2, 1, n_factors / 3.0)
+    active_main = p_main < alpha_main
+
+    # Error variance of each response, pooling the odd parts of its inactive main effects
+    n_active = active_main.sum(axis=0)
+    df_error = np.where(len(first) > n_active, len(first) - n_active, n_factors / 3.0)
+    error_variance = np.empty(len(response_names))
+    for k in range(len(response_names)):
+        if len(first) > n_active[k]:
+            active = active_main[:, k]
+            fitted_odd = A[:, active] @ np.linalg.lstsq(A[:, active], Y_odd[:, k], rcond=None)[0]
+            error_variance[k] = (Y_odd[:, k] @ Y_odd[:, k] - fitted_odd @ Y_odd[:, k]) / df_error[k]
+        else:
+            error_variance[k] = pseudo_standard_error[k] ** 2
+
+    # Stage 2: second-order terms by forward selection on the even parts. The responses are advanced in lockstep,
+    # so that the lack of fit of all of them is tested at once at each step.
+    candidates_cache = {}
+    states = []
+    for k in range(len(response_names)):
+        key = active_main[:, k].tobytes()
+        if key not in candidates_cache:
+            names, pairs = _get_second_order_terms(active_main[:, k], is_categorical, factor_names, heredity)
+            candidates = A[:, pairs[:, 0]] * A[:, pairs[:, 1]]
+            candidates_cache[key] = (names, candidates, np.sum(candidates**2, axis=0))
+        candidates = candidates_cache[key][1]
+        residual = Y_even[:, k] - Y_even[:, k].mean()
+        states.append({"Z": candidates - candidates.mean(axis=0), "residual": residual, "selected": []})
+
+    open_responses = list(range(len(response_names)))
+    for n_selected in range(n_even - 1):
+        if not open_responses:
+            break
+        df_lack_of_fit = n_even - 1 - n_selected
+        rss = np.array([states[k]["residual"] @ states[k]["residual"] for k in open_responses])
+        ks = np.array(open_responses, dtype=np.intp)
+        p_lack_of_fit = _f_sf(rss / df_lack_of_fit / error_variance[ks], df_lack_of_fit, df_error[ks])
+        open_responses = []
+        for k in ks[p_lack_of_fit < alpha_second]:
+            state = states[k]
+            Z, residual = state["Z"], state["residual"]
+            z_norms = np.sum(Z**2, axis=0)
+            estimable = z_norms > 1e-10 * np.maximum(candidates_cache[active_main[:, k].tobytes()][2], 1.0)
+            estimable[state["selected"]] = False
+            if not estimable.any():
+                continue
+            reduction = np.where(estimable, (residual @ Z) ** 2 / np.where(estimable, z_norms, 1.0), -np.inf)
+            best = int(np.argmax(reduction))
+            q = Z[:, best] / np.sqrt(z_norms[best])
+            residual -= q * (q @ residual)
+            Z -= np.outer(q, q @ Z)
+            state["selected"].append(best)
+            open_responses.append(int(k))
+
+    # Final least squares fit of the selected model of each response
+    estimates = {"Response": [], "Term": [], "Estimate": [], "Std Error": [], "t Ratio": [], "df": []}
+    coefficients, summary = {}, []
+    for k, response_nm in enumerate(response_names):
+        active, selected = active_main[:, k], states[k]["selected"]
+        candidate_nms, candidates, _ = candidates_cache[active.tobytes()]
+        term_nms = ["(1)"] + [factor_names[j] for j in np.flatnonzero(active)] + [candidate_nms[j] for j in selected]
+        X = np.column_stack([np.ones(n_trials), A[:, active], candidates[:, selected]])
+        beta = np.linalg.lstsq(X, Y[:, k], rcond=None)[0]
+        rss = np.sum((Y[:, k] - X @ beta) ** 2)
+        df_residual = n_trials - X.shape[1]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            std_error = np.sqrt(rss / df_residual * np.diag(np.linalg.inv(X.T @ X))) if df_residual > 0 else np.nan
+        estimates["Response"] += [response_nm] * len(term_nms)
+        estimates["Term"] += term_nms
+        estimates["Estimate"].append(beta)
+        estimates["Std Error"].append(np.broadcast_to(std_error, beta.shape))
+        estimates["df"] += [df_residual] * len(term_nms)
+        coefficients[response_nm] = pd.Series(beta, index=term_nms)
+        total = Y[:, k] - Y[:, k].mean()
+        summary.append(
+            {
+                "Response": response_nm,
+                "Active Main Effects": int(n_active[k]),
+                "Second Order Terms": len(selected),
+                "RMSE": np.sqrt(rss / df_residual) if df_residual > 0 else np.nan,
+                "R Squared": 1.0 - rss / (total @ total) if total.any() else np.nan,
+                "Residual Degrees of Freedom": df_residual,
+            }
+        )
+
+    estimates["Estimate"] = np.concatenate(estimates["Estimate"])
+    estimates["Std Error"] = np.concatenate(estimates["Std Error"])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        estimates["t Ratio"] = estimates["Estimate"] / estimates["Std Error"]
+    estimates["Prob>|t|"] = _f_sf(estimates["t Ratio"] ** 2, 1, estimates.pop("df"))
+
+    all_terms = _get_all_terms(is_categorical, factor_names)
+    coefficients = pd.DataFrame(coefficients, index=all_terms, columns=response_names).fillna(0.0)
+
+    return {
+        "Parameter Estimates": pd.DataFrame(estimates),
+        "Coefficients": coefficients,
+        "Summary": pd.DataFrame(summary),
+    }
+
+
+@instrumented("response.simulate_power")
+def simulate_power(
+    A,
+    coefficients,
+    effects=("intercept", "main"),
+    noise=1.0,
+    n_replicates=10000,
+    alpha=0.05,
+    selection="ols",
+    batch_size=1000,
+    n_jobs=None,
+    seed=0,
+):
+    """Estimate by Monte Carlo simulation how often each term is detected on a design, before running it.
+
+    The replicate responses, the true model plus independent normal noise, are drawn @batch_size at a time as
+    the columns of one matrix, and the batches are analyzed across a pool of @n_jobs threads:
+        'ols': the model of @effects is fitted to all the replicates of a batch from a single QR factorization
+            of its model matrix, and a term is detected if its t-test has p-value < alpha;
+        'two-stage': the terms are selected by fit_definitive_screening, with alpha_main = alpha_second = alpha,
+            which analyzes all the replicates of a batch in one call.
+
+    Inputs:
+
+        A (numpy.array)
+            Coded design, e.g., generate(..., output="coded"). Categorical factors, coded 1 and 2, are recoded
+            to -1 and 1.
+
+        coefficients (dict)
+            True model, as the coefficient of each term named as in get_X, e.g., {"X1": 2.0, "X1*X2": 1.0}.
+
+        noise (float)
+            Standard deviation of the noise.
+
+    Outputs:
+
+        power (dict)
+            "Detection Rates": pandas.DataFrame with the "True Coefficient" of each term of the analysis, whether
+                it is "Active" (non-zero), and its "Detection Rate": the power for the active terms and the false
+                positive rate for the inactive ones.
+            "False Discovery Rate": average fraction of inactive terms among the detected ones (intercept excluded).
+            "Exact Selection Rate": fraction of replicates where exactly the active terms are detected.
+    """
+    import pandas as pd
+    from concurrent.futures import ThreadPoolExecutor
+
+    if selection not in ["ols", "two-stage"]:
+        raise ValueError(f"Selection `{selection}` must be 'ols' or 'two-stage'")
+
+    A = _code_design(A)
+    n_trials, n_factors = A.shape
+    true_terms = {term_nm: _parse_term(term_nm, n_factors) for term_nm in coefficients}
+    unknown = [term_nm for term_nm, term in true_terms.items() if term is None]
+    if unknown:
+        raise ValueError(f"Unknown terms {sorted(unknown)}: terms are named as in get_X, e.g., X1, X1*X2, X1^2")
+    # Only the columns of the true terms are built
+    X_true = _get_term_columns(A, list(true_terms.values()))
+    signal = X_true @ np.array([float(value) for value in coefficients.values()])
+
+    if selection == "ols":
+        X, term_nms = get_X(A, effects=effects, return_names=True, dtype=float)
+        Q, R = np.linalg.qr(X)
+        if np.min(np.abs(np.diag(R)), initial=np.inf) <= 1e-10 * np.max(np.abs(np.diag(R)), initial=0.0):
+            raise np.linalg.LinAlgError("The model is not estimable: rank deficient design")
+        df_residual = n_trials - X.shape[1]
+        if df_residual <= 0:
+            raise ValueError(f"The model has {X.shape[1]} terms: more runs than {n_trials} are needed to test them")
+        R_inverse = np.linalg.inv(R)
+        critical = _f_isf(alpha, 1, df_residual) * np.sum(R_inverse**2, axis=1)[:, np.newaxis]
+
+        def detect(Y):
+            QtY = Q.T @ Y
+            error_variance = (np.sum(Y**2, axis=0) - np.sum(QtY**2, axis=0)) / df_residual
+            return (R_inverse @ QtY) ** 2 > critical * error_variance
+
+    else:
+        term_nms = _get_all_terms(np.all(np.abs(A) == 1.0, axis=0), [f"X{i + 1}" for i in range(n_factors)])
+
+        def detect(Y):
+            fit = fit_definitive_screening(
+                A, Y, response_names=list(range(Y.shape[1])), alpha_main=alpha, alpha_second=alpha
+            )
+            return fit["Coefficients"].to_numpy() != 0.0
+
+    active = np.array([coefficients.get(term_nm, 0.0) != 0.0 for term_nm in term_nms])
+    is_term = np.array([term_nm != "(1)" for term_nm in term_nms])
+    sizes = [min(batch_size, n_replicates - start) for start in range(0, n_replicates, batch_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+
+    def simulate(batch):
+        rng = np.random.default_rng(seeds[batch])
+        Y = signal[:, np.newaxis] + noise * rng.standard_normal((n_trials, sizes[batch]))
+        detected = detect(Y)
+        n_detected = detected[is_term].sum(axis=0)
+        n_false = (detected[is_term] & ~active[is_term, np.newaxis]).sum(axis=0)
+        n_exact = np.sum(np.all(detected[is_term] == active[is_term, np.newaxis], axis=0))
+        return detected.sum(axis=1), np.sum(n_false / np.maximum(n_detected, 1)), n_exact
+
+    n_detected, false_discovery, n_exact = np.zeros(len(term_nms)), 0.0, 0
+    with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+        for batch_detected, batch_false_discovery, batch_exact in pool.map(simulate, range(len(sizes))):
+            n_detected += batch_detected
+            false_discovery += batch_false_discovery
+            n_exact += batch_exact
+
+    return {
+        "Detection Rates": pd.DataFrame(
+            {
+                "Term": term_nms,
+                "True Coefficient": [coefficients.get(term_nm, 0.0) for term_nm in term_nms],
+                "Active": active,
+                "Detection Rate": n_detected / n_replicates,
+            }
+        ),
+        "False Discovery Rate": false_discovery / n_replicates,
+        "Exact Selection Rate": n_exact / n_replicates,
+    }
@@ -0,0 +1,172 @@
+"""Run sheets: a coded design with the factors mapping it to actual values, saved to a compact binary file.
+
+A run sheet file is an 8-bytes magic string, the length of a JSON header (uint64, little-endian), the JSON header
+with the method, the factors (name and range, in the order of the columns), the shape and the CRC-32 checksum of
+the design, and finally the coded design as an int8 array (row-major): about one byte per trial and factor.
+Loading memory-maps the design, without copying it, and the actual values are computed only when requested.
+
+Usage:
+
+    run_sheet = generate(factors_dict={"Temperature": (30, 90), "Solvent": ("A", "B")}, output="run_sheet")
+    run_sheet.save("run_sheet.dsd")
+    run_sheet = load_run_sheet("run_sheet.dsd")
+    run_sheet.coded  # read-only int8 view on the file
+    run_sheet.as_output("dataframe")  # same as generate(..., output="dataframe")
+"""
+
+import json
+import zlib
+
+import numpy as np
+
+from .instrumentation import stage
+
+MAGIC = b"DSDRUN01"
+_HEADER_SIZE_DTYPE = np.dtype("<u8")
+OUTPUTS = ("dataframe", "coded", "codes", "structured")
+
+
+def is_categorical(factor_range):
+    """Factors whose levels are strings or booleans are categorical, the others numerical."""
+    return isinstance(factor_range[0], (bool, np.bool_, str))
+
+
+def format_coded(coded, factors_dict, output):
+    """Map a coded design, with the columns in the order of factors_dict, to an output of generate
+    ('coded', 'codes', 'structured' or 'dataframe')."""
+    if output == "coded":
+        return coded
+
+    # Index of the level of each trial: 0, 1, 2 for low, mid, high numerical values and 0, 1 for categoricals
+    factor_nms = list(factors_dict.keys())
+    is_cat = np.array([is_categorical(factors_dict[nm]) for nm in factor_nms], dtype=bool)
+    codes = (coded - np.where(is_cat, 1, -1)).astype(np.int8)
+    if output == "codes":
+        return codes
+
+    levels = {}
+    for factor_nm, factor_is_cat in zip(factor_nms, is_cat):
+        if factor_is_cat:
+            levels[factor_nm] = np.array(factors_dict[factor_nm], dtype=object)
+        else:
+            low, high = factors_dict[factor_nm]
+            levels[factor_nm] = np.array([low, np.mean(factors_dict[factor_nm]), high], dtype=float)
+
+    if output == "structured":
+        with stage("generate.structured") as structured_stage:
+            dtype = [
+                (nm, np.asarray(factors_dict[nm]).dtype if factor_is_cat else levels[nm].dtype)
+                for nm, factor_is_cat in zip(factor_nms, is_cat)
+            ]
+            dsd_struct = np.empty(len(codes), dtype=dtype)
+            for j, factor_nm in enumerate(factor_nms):
+                dsd_struct[factor_nm] = levels[factor_nm][codes[:, j]]
+            structured_stage.add_bytes(dsd_struct)
+        return dsd_struct
+
+    with stage("generate.dataframe") as dataframe_stage:
+        import pandas as pd  # imported only here, as it is slow to import and not needed by the other outputs
+
+        # Set indexes to 1-to-N range (instead of 0-to-(N-1))
+        index = pd.RangeIndex(1, len(codes) + 1)
+        dsd_df = pd.DataFrame(
+            {
+                nm: pd.Series(levels[nm][codes[:, j]], index=index, dtype=levels[nm].dtype, copy=False)
+                for j, nm in enumerate(factor_nms)
+            },
+            index=index,
+        )
+        dataframe_stage.add_bytes(dsd_df)
+
+    return dsd_df
+
+
+class RunSheet:
+    """A coded design (int8, read-only) with the factors mapping its columns to actual values, and its method.
+
+    The coded values are -1, 0, 1 for numerical and 1, 2 for categorical factors, the columns following the order
+    of factors_dict, as generate(..., output="coded").
+    """
+
+    def __init__(self, coded, factors_dict, method="dsd"):
+        coded = np.asarray(coded)
+        factors_dict = {nm: tuple(factor_range) for nm, factor_range in factors_dict.items()}
+        if coded.ndim != 2 or coded.shape[1] != len(factors_dict):
+            raise ValueError(f"The coded design of shape {coded.shape} has not one column per factor")
+        if method not in ["dsd", "orth"]:
+            raise ValueError(f"Method `{method}` must be 'dsd' or 'orth'")
+        for j, (factor_nm, factor_range) in enumerate(factors_dict.items()):
+            if len(factor_range) != 2:
+                raise ValueError(f"Factor `{factor_nm}` has not two range values: {factor_range}")
+            allowed = [1, 2] if is_categorical(factor_range) else [-1, 0, 1]
+            if not np.isin(coded[:, j], allowed).all():
+                raise ValueError(f"The coded values of factor `{factor_nm}` are not all in {allowed}")
+        coded = coded.astype(np.int8, copy=False).view()
+        coded.flags.writeable = False
+
+        self.coded = coded
+        self.factors_dict = factors_dict
+        self.method = method
+
+    def __len__(self):
+        return len(self.coded)
+
+    def as_output(self, output="dataframe"):
+        """Return the design in an output format of generate: 'dataframe', 'coded', 'codes' or 'structured'."""
+        if output not in OUTPUTS:
+            raise ValueError(f"Output `{output}` must be 'dataframe', 'coded', 'codes' or 'structured'")
+        return format_coded(self.coded, self.factors_dict, output)
+
+    def save(self, path):
+        """Write the run sheet to a binary file at @path, returning the number of bytes written."""
+        coded = np.ascontiguousarray(self.coded, dtype=np.int8)
+        blob = coded.tobytes()
+        factors = [[nm, [_to_json(value) for value in factor_range]] for nm, factor_range in self.factors_dict.items()]
+        header = {
+            "version": 1,
+            "method": self.method,
+            "factors": factors,
+            "shape": list(coded.shape),
+            "crc": zlib.crc32(blob),
+        }
+        header = json.dumps(header, separators=(",", ":")).encode("utf-8")
+        with open(path, "wb") as fh:
+            fh.write(MAGIC)
+            fh.write(np.array(len(header), dtype=_HEADER_SIZE_DTYPE).tobytes())
+            fh.write(header)
+            fh.write(blob)
+        return len(MAGIC) + _HEADER_SIZE_DTYPE.itemsize + len(header) + len(blob)
+
+
+def _to_json(value):
+    """Python scalar of a factor level (e.g., from numpy.int64), so that it is written as a JSON number."""
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def load_run_sheet(path, verify=True):
+    """Read a run sheet written by RunSheet.save, memory-mapping the coded design without copying it.
+
+    If verify, the checksum of the design is checked, raising ValueError if the file is corrupted.
+    """
+    path = str(path)
+    with open(path, "rb") as fh:
+        if fh.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"File `{path}` is not a run sheet.")
+        header_size = int(np.frombuffer(fh.read(_HEADER_SIZE_DTYPE.itemsize), dtype=_HEADER_SIZE_DTYPE)[0])
+        header = json.loads(fh.read(header_size).decode("utf-8"))
+    data_offset = len(MAGIC) + _HEADER_SIZE_DTYPE.itemsize + header_size
+
+    shape = tuple(header["shape"])
+    if shape[0] * shape[1] > 0:
+        coded = np.asarray(np.memmap(path, dtype=np.int8, mode="r", offset=data_offset, shape=shape))
+    else:
+        coded = np.zeros(shape, dtype=np.int8)
+    if verify and zlib.crc32(coded) != header["crc"]:
+        raise ValueError(f"Checksum mismatch for the run sheet `{path}`.")
+
+    # The checksum replaces the validation of RunSheet.__init__, which would read the whole design
+    run_sheet = RunSheet.__new__(RunSheet)
+    run_sheet.coded = coded
+    run_sheet.factors_dict = {nm: tuple(factor_range) for nm, factor_range in header["factors"]}
+    run_sheet.method = header["method"]
+    return run_sheet
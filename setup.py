@@ -17,11 +17,14 @@ if __name__ == "__main__":
         license="None",
         classifiers=["Programming Language :: Python"],
         version="0.5.1",
-        install_requires=["numpy", "pandas", "matplotlib", "seaborn"],
+        install_requires=["numpy", "pandas"],
         extras_require={
+            "plot": ["matplotlib", "seaborn"],
             "dev": [
+                "matplotlib",
+                "seaborn",
                 "pre-commit",
                 "ruff==0.1.13",
-            ]
+            ],
         },
     )
@@ -1,6 +1,8 @@
 import itertools
+import subprocess
 import unittest
 import os
+from unittest import mock
 import sys
 
 import numpy as np
@@ -12,15 +14,168 @@ sys.path.insert(0, PARENTDIR)
 
 
 class TestA(unittest.TestCase):
+    def test_import_does_not_load_pandas_or_plotting(self):
+        code = (
+            "import sys, time; start = time.perf_counter(); import definitive_screening_design; "
+            "print(time.perf_counter() - start); "
+            "print(*[m for m in ('pandas', 'matplotlib', 'seaborn') if m in sys.modules])"
+        )
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True, cwd=PARENTDIR)
+        import_time, loaded = (result.stdout.splitlines() + [""])[:2]
+        self.assertEqual(loaded, "", f"Heavy modules loaded at import ({float(import_time):.3f} s): {loaded}")
+
     def test_primes(self):
         self.assertEqual(
             list(map(dsd._generalized_dsd.isprime, [2371, 2927, 6949, 6948, 1249, 3739, 9311])),
             [True, True, True, False, True, True, True],
         )
 
+    def test_next_prime_grows_sieve(self):
+        self.assertEqual(
+            list(map(dsd._generalized_dsd.next_prime, [3, 9, 24, 90, 2370, 6948, 104724])),
+            [3, 11, 29, 97, 2371, 6949, 104729],
+        )
+
+    def test_n_runs_matches_generate(self):
+        for n_num, n_cat, method in itertools.product([0, 2, 7, 12, 23], [0, 1, 3], ["dsd", "orth"]):
+            if n_num + n_cat == 0:
+                continue
+            with self.subTest(n_num=n_num, n_cat=n_cat, method=method):
+                self.assertEqual(
+                    dsd.get_n_runs(n_num=n_num, n_cat=n_cat, method=method),
+                    len(dsd.generate(n_num=n_num, n_cat=n_cat, method=method, verbose=False)),
+                )
+
+    def test_design_cache_returns_read_only_shared_array(self):
+        dsd.clear_design_cache()
+        first = dsd._generalized_dsd._compute_dsd(7, 2, "orth")
+        second = dsd._generalized_dsd._compute_dsd(7, 2, "orth")
+        self.assertIs(first, second)
+        self.assertFalse(first.flags.writeable)
+        info = dsd.design_cache_info()
+        self.assertEqual((info.hits, info.misses, info.currsize), (1, 1, 1))
+
+        dsd.set_design_cache_size(1)
+        dsd._generalized_dsd._compute_dsd(7, 2, "orth")
+        dsd._generalized_dsd._compute_dsd(8, 0, "dsd")
+        self.assertIsNot(dsd._generalized_dsd._compute_dsd(7, 2, "orth"), first)
+        np.testing.assert_array_equal(dsd._generalized_dsd._compute_dsd(7, 2, "orth"), first)
+        self.assertEqual(dsd.design_cache_info().currsize, 1)
+
+        dsd.set_design_cache_size(dsd._generalized_dsd.DESIGN_CACHE_SIZE)
+        self.assertEqual(dsd.design_cache_info().currsize, 0)
+
+    def test_paley_matrix_matches_legendre_definition(self):
+        for q in [3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41, 43, 47]:
+            with self.subTest(q=q):
+                fld = np.arange(q)
+                upper = np.zeros((q, q))
+                for i in range(q):
+                    for j in range(i, q):
+                        upper[i, j] = dsd._generalized_dsd.get_legendre(i, j, fld)
+                expected = upper + upper.T * (-1 if q % 4 == 3 else 1)
+                np.testing.assert_array_equal(dsd._generalized_dsd.get_paley_matrix(q), expected)
+
+    def test_prime_power_conference_matrices(self):
+        for q in [9, 25, 27, 49, 81, 121, 125]:
+            with self.subTest(q=q):
+                paley = dsd._generalized_dsd.get_paley_matrix(q)
+                conference = np.block([[np.zeros((1, 1)), np.ones((1, q))], [np.ones((q, 1)), paley]])
+                np.testing.assert_array_equal(conference.T @ conference, q * np.eye(q + 1))
+        for q in [15, 16, 45]:
+            with self.assertRaisesRegex(ValueError, f"odd prime power: {q}"):
+                dsd._generalized_dsd.get_paley_matrix(q)
+
+    def test_prime_power_orders_give_minimal_runs(self):
+        for k in [27, 28, 49, 50]:
+            with self.subTest(k=k):
+                # int64, as the int8 sums of products could overflow
+                design = dsd.design.generate(n_num=k, verbose=False, output="coded").astype(np.int64)
+                self.assertEqual(design.shape, (2 * (k + k % 2) + 1, k))
+                self.assertEqual(dsd.get_n_runs(n_num=k), design.shape[0])
+                gram = design.T @ design
+                np.testing.assert_allclose(gram - np.diag(np.diag(gram)), 0)
+                interactions = design[:, :, np.newaxis] * design[:, np.newaxis, :]
+                np.testing.assert_allclose(np.einsum("ri,rjk->ijk", design, interactions), 0)
+
     def test_example(self):
         self.assertEqual(dsd.design.generate(n_num=3, n_cat=2).shape, (14, 5))
 
+    def test_example_coded_design(self):
+        expected = [
+            [0, 1, 1, 2, 2],
+            [0, -1, -1, 1, 1],
+            [1, 0, -1, 2, 1],
+            [-1, 0, 1, 1, 2],
+            [1, -1, 0, 2, 2],
+            [-1, 1, 0, 1, 1],
+            [1, 1, -1, 1, 2],
+            [-1, -1, 1, 2, 1],
+            [1, 1, 1, 2, 1],
+            [-1, -1, -1, 1, 2],
+            [1, -1, 1, 1, 2],
+            [-1, 1, -1, 2, 1],
+            [0, 0, 0, 1, 1],
+            [0, 0, 0, 2, 2],
+        ]
+        design = dsd.generate(n_num=3, n_cat=2, verbose=False).replace({"A": 1, "B": 2})
+        np.testing.assert_array_equal(design.to_numpy(dtype=float), expected)
+
+    def test_output_formats_are_consistent(self):
+        factors = {"T": (30, 90), "S": ("A", "B"), "P": (0.1, 0.3), "F": (False, True)}
+        kwargs = dict(factors_dict=factors, method="orth", verbose=False)
+        dsd_df = dsd.generate(**kwargs)
+        coded = dsd.generate(output="coded", **kwargs)
+        codes = dsd.generate(output="codes", **kwargs)
+        structured = dsd.generate(output="structured", **kwargs)
+
+        self.assertEqual(list(dsd_df.columns), list(factors))
+        self.assertEqual(list(structured.dtype.names), list(factors))
+        self.assertEqual(coded.shape, dsd_df.shape)
+        self.assertEqual(coded.dtype, np.int8)
+        self.assertEqual(codes.dtype, np.int8)
+        np.testing.assert_array_equal(codes[:, [0, 2]], coded[:, [0, 2]] + 1)
+        np.testing.assert_array_equal(codes[:, [1, 3]], coded[:, [1, 3]] - 1)
+        for j, (factor_nm, (low, high)) in enumerate(factors.items()):
+            levels = [low, high] if j % 2 else [low, (low + high) / 2, high]
+            expected = [levels[code] for code in codes[:, j]]
+            self.assertEqual(list(dsd_df[factor_nm]), expected)
+            self.assertEqual(list(structured[factor_nm]), expected)
+
+        with self.assertRaises(ValueError):
+            dsd.generate(n_num=4, output="csv")
+
+    def test_generate_batch(self):
+        specs = [
+            dict(n_num=n_num, n_cat=n_cat, method=method)
+            for n_num, n_cat, method in itertools.product([3, 8, 13], [0, 2], ["dsd", "orth"])
+        ]
+        specs.append(dict(n_num=8, n_cat=2, method="orth"))  # duplicate
+        specs.append(dict(factors_dict={"T": (30, 90), "S": ("A", "B")}, output="coded"))
+        unique_specs = specs[:12] + specs[13:]
+        expected = [(spec, dsd.generate(verbose=False, **spec)) for spec in unique_specs]
+
+        for executor in [None, "thread", "process"]:
+            with self.subTest(executor=executor):
+                results = list(dsd.generate_batch(iter(specs), executor=executor, max_workers=2))
+                self.assertEqual([spec for spec, _ in results], [spec for spec, _ in expected])
+                for (_, actual), (_, design) in zip(results, expected):
+                    np.testing.assert_array_equal(np.asarray(actual), np.asarray(design))
+
+        results = list(dsd.generate_batch(specs, executor="thread", ordered=False, max_pending=3))
+        self.assertEqual(len(results), len(expected))
+        for spec, design in results:
+            np.testing.assert_array_equal(np.asarray(design), np.asarray(expected[unique_specs.index(spec)][1]))
+
+    def test_generate_batch_remembers_only_the_recent_specs(self):
+        specs = [dict(n_num=n_num, output="coded") for n_num in [3, 4, 3, 5, 6, 3, 4]]
+        with mock.patch.object(dsd.design, "BATCH_DEDUP_SIZE", 2):
+            results = list(dsd.generate_batch(specs, executor=None))
+        # The second 3 is skipped, but the last 3 and 4 were forgotten meanwhile
+        self.assertEqual([spec["n_num"] for spec, _ in results], [3, 4, 5, 6, 3, 4])
+        with self.assertRaisesRegex(ValueError, "Executor `pool`"):
+            list(dsd.generate_batch(specs, executor="pool"))
+
     def test_10(self):
         self.assertEqual(dsd.design.generate(10).shape[0], 21)
 
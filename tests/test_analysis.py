@@ -1,16 +1,150 @@
+import importlib.util
+import io
+import os
+import tempfile
 import unittest
 import warnings
+from itertools import combinations
 
 import numpy as np
 
 from definitive_screening_design.analysis import (
+    DesignEvaluator,
+    compare_models,
+    get_X,
+    get_XtX,
+    get_XtY,
+    get_aliased_pairs,
+    get_column_stats,
+    get_g_efficiency,
+    get_i_efficiency,
+    get_moment_matrix,
+    get_robustness_report,
+    iter_X_blocks,
     get_efficiency,
+    get_efficiency_table,
     get_map_of_correlations,
+    get_map_of_correlations_blocked,
     get_variance,
+    _aggregate_blocks,
+    _get_term_columns,
+    _parse_term,
+    render_map_of_correlations,
 )
+from definitive_screening_design.design import generate
+
+ALL_EFFECTS = ("intercept", "main", "2-interactions", "3-interactions", "quadratic")
 
 
 class TestAnalysis(unittest.TestCase):
+    def test_model_matrix_terms_and_dtype(self):
+        design = np.arange(12.0).reshape(3, 4) - 5.0
+        columns = {"(1)": np.ones(3)}
+        for i in range(4):
+            columns[f"X{i+1}"] = design[:, i]
+        for i, j in combinations(range(4), 2):
+            columns[f"X{i+1}*X{j+1}"] = design[:, i] * design[:, j]
+        for i, j, k in combinations(range(4), 3):
+            columns[f"X{i+1}*X{j+1}*X{k+1}"] = design[:, i] * design[:, j] * design[:, k]
+        for i in range(4):
+            columns[f"X{i+1}^2"] = design[:, i] ** 2
+
+        X, names = get_X(design, effects=ALL_EFFECTS[::-1], return_names=True)
+        self.assertEqual(names, list(columns))
+        np.testing.assert_array_equal(X, np.column_stack(list(columns.values())))
+
+        X32 = get_X(design, effects=ALL_EFFECTS, dtype=np.float32)
+        self.assertEqual(X32.dtype, np.float32)
+        np.testing.assert_array_equal(X32, X)
+        self.assertEqual(get_X(design.astype(int), effects=("main", "quadratic")).dtype, np.float64)
+
+        # int8 coded designs give float64 terms by default, exact integer terms with an integer dtype
+        coded = np.array([[-1, 0, 1, 2], [1, -1, 0, 1], [0, 1, -1, 2]], dtype=np.int8)
+        self.assertEqual(get_X(coded, effects=ALL_EFFECTS[1:]).dtype, np.float64)
+        self.assertEqual(get_X(coded, effects=ALL_EFFECTS).dtype, np.float64)
+        X8 = get_X(coded, effects=ALL_EFFECTS[1:], dtype=np.int8)
+        self.assertEqual(X8.dtype, np.int8)
+        np.testing.assert_array_equal(X8, get_X(coded.astype(float), effects=ALL_EFFECTS[1:]))
+        X16 = get_X(coded * np.int8(50), effects=("main", "quadratic"), dtype=np.int8)
+        self.assertEqual(X16.dtype, np.int16)
+        np.testing.assert_array_equal(X16, get_X(coded * 50.0, effects=("main", "quadratic")))
+
+        # The products of the terms of large int8 designs do not overflow
+        coded = generate(n_num=200, verbose=False, output="coded")
+        self.assertEqual(coded.dtype, np.int8)
+        X = get_X(coded, effects=("main", "quadratic"))
+        expected = get_X(coded.astype(float), effects=("main", "quadratic"))
+        np.testing.assert_array_equal(X.T @ X, expected.T @ expected)
+        self.assertGreater(np.diag(X.T @ X).min(), 127)
+
+    def test_model_matrix_blocks_and_reductions(self):
+        design = np.random.default_rng(0).choice([-1.0, 0.0, 1.0], size=(13, 6))
+        responses = np.random.default_rng(1).normal(size=(13, 3))
+        X, names = get_X(design, effects=ALL_EFFECTS, return_names=True)
+
+        blocks = list(iter_X_blocks(design, effects=ALL_EFFECTS, block_size=16))
+        self.assertTrue(all(block.shape == (13, len(block_names)) for block, block_names in blocks))
+        self.assertTrue(all(len(block_names) <= 16 for _, block_names in blocks))
+        np.testing.assert_array_equal(np.hstack([block for block, _ in blocks]), X)
+        self.assertEqual([name for _, block_names in blocks for name in block_names], names)
+
+        np.testing.assert_allclose(get_XtX(design, effects=ALL_EFFECTS, block_size=16), X.T @ X)
+        np.testing.assert_allclose(get_XtY(design, responses, effects=ALL_EFFECTS, block_size=16), X.T @ responses)
+        stats = get_column_stats(design, effects=ALL_EFFECTS, block_size=16)
+        np.testing.assert_allclose(stats["mean"], X.mean(axis=0))
+        np.testing.assert_allclose(stats["std"], X.std(axis=0))
+        np.testing.assert_allclose(stats["norm"], np.linalg.norm(X, axis=0))
+
+    def test_blocked_correlations_match_full_map(self):
+        design = np.random.default_rng(0).choice([-1.0, 0.0, 1.0], size=(13, 5))
+        expected = get_map_of_correlations(design, absolute=False, plot=False)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            out = np.lib.format.open_memmap(os.path.join(tmpdir, "moc.npy"), mode="w+", shape=expected.shape)
+            actual = get_map_of_correlations_blocked(design, absolute=False, block_size=7, n_jobs=2, out=out)
+            self.assertIs(actual, out)
+            np.testing.assert_allclose(actual, expected, atol=1e-12)
+            del actual, out
+
+        pairs = get_aliased_pairs(design, threshold=0.5, block_size=7)
+        row, col = np.nonzero(np.tril(np.abs(expected) >= 0.5, -1))
+        self.assertEqual(set(zip(pairs["row"], pairs["col"])), set(zip(row, col)))
+        np.testing.assert_allclose(pairs["correlation"], expected[pairs["row"], pairs["col"]], atol=1e-12)
+
+        top = get_aliased_pairs(design, threshold=0.0, top_k=2, block_size=7)
+        magnitude = np.abs(expected)
+        np.fill_diagonal(magnitude, 0.0)
+        self.assertEqual(len(top["row"]), 2 * len(magnitude))
+        np.testing.assert_allclose(
+            np.abs(top["correlation"]), np.sort(magnitude, axis=1)[:, ::-1][:, :2].ravel(), atol=1e-12
+        )
+
+    @unittest.skipUnless(importlib.util.find_spec("matplotlib"), "matplotlib is not installed")
+    def test_render_map_of_correlations_off_screen(self):
+        design = np.random.default_rng(0).choice([-1.0, 0.0, 1.0], size=(13, 5))
+        moc = get_map_of_correlations(design, plot=False)
+        names = get_X(design, effects=ALL_EFFECTS, return_names=True)[1][1:]
+
+        buffer = io.BytesIO()
+        moc_plotted = get_map_of_correlations(design, annot=True, output=buffer)
+        np.testing.assert_array_equal(moc_plotted, moc)
+        self.assertEqual(buffer.getvalue()[:8], b"\x89PNG\r\n\x1a\n")
+        written = {text.get_text() for text in render_map_of_correlations(moc, names, io.BytesIO()).axes[0].texts}
+        row, col = np.nonzero(np.tril(moc >= 0.5, -1))
+        self.assertEqual(written, {f"{value:.2f}" for value in moc[row, col]})
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            render_map_of_correlations(moc, output=os.path.join(tmpdir, "moc.svg"), max_cells=4)
+            with open(os.path.join(tmpdir, "moc.svg")) as fh:
+                self.assertIn("<svg", fh.read())
+
+        # Blocks of 4 terms, padded at the end, keep the maximum absolute off-diagonal correlation
+        aggregated = _aggregate_blocks(moc, 4)
+        self.assertEqual(aggregated.shape, (8, 8))
+        off_diagonal = np.abs(moc) + np.diag(np.full(len(moc), np.nan))
+        self.assertEqual(aggregated[7, 1], np.nanmax(off_diagonal[28:, 4:8]))
+        self.assertEqual(aggregated[2, 2], np.nanmax(off_diagonal[8:12, 8:12]))
+
     def test_correlations_leave_constant_terms_undefined_without_warning(self):
         design = np.array(
             [
@@ -74,6 +208,23 @@ class TestAnalysis(unittest.TestCase):
             efficiency["A-Efficiency (%)"], expected_a
         )
 
+    def test_efficiency_table_matches_single_design_efficiency(self):
+        rng = np.random.default_rng(0)
+        designs = {f"design {i}": rng.choice([-1.0, 0.0, 1.0], size=(9 + 4 * (i % 2), 3)) for i in range(6)}
+        designs["constant"] = np.ones((9, 3))
+        effects_list = [("intercept", "main"), ("intercept", "main", "quadratic")]
+
+        for method in ["auto", "svd"]:
+            table = get_efficiency_table(designs, effects_list, method=method)
+            self.assertEqual(len(table), len(designs) * len(effects_list))
+            self.assertEqual(list(table["Design"][: len(designs)]), list(designs))
+            for _, row in table.iterrows():
+                expected = get_efficiency(designs[row["Design"]], effects=tuple(row["Effects"].split(", ")))
+                self.assertEqual(row["Number of Parameters"], expected["Number of Parameters"])
+                np.testing.assert_allclose(row["D-Efficiency (%)"], expected["D-Efficiency (%)"], atol=1e-10)
+                np.testing.assert_allclose(row["A-Efficiency (%)"], expected["A-Efficiency (%)"], atol=1e-10)
+            self.assertEqual(table["Rank"].iloc[len(designs) - 1], 1)
+
     def test_prediction_variance_returns_diagonal_for_each_point(self):
         design = np.array([[-1.0], [0.0], [1.0]])
         points = np.array([[-1.0, 0.0, 1.0]])
@@ -87,6 +238,125 @@ class TestAnalysis(unittest.TestCase):
 
         np.testing.assert_allclose(actual, expected)
 
+    def test_evaluator_matches_explicit_inverse_across_chunks(self):
+        design = np.random.default_rng(0).choice([-1.0, 0.0, 1.0], size=(17, 4))
+        points = np.random.default_rng(1).uniform(-1.0, 1.0, size=(4, 25))
+        effects = ("intercept", "main", "quadratic")
+        X = get_X(design, effects=effects)
+        Xp = get_X(points.T, effects=effects)
+        expected = np.einsum("ij,jk,ik->i", Xp, np.linalg.inv(X.T @ X), Xp)
+
+        evaluator = DesignEvaluator(design, effects=effects, chunk_size=4)
+        np.testing.assert_allclose(evaluator.variance(points), expected)
+        np.testing.assert_allclose(evaluator.variance(points[:, :3]), expected[:3])
+        with self.assertRaises(ValueError):
+            evaluator.variance(points[:3])
+
+    def test_i_efficiency_uses_closed_form_moments(self):
+        np.testing.assert_allclose(
+            get_moment_matrix(1, ("intercept", "main", "quadratic")),
+            [[1.0, 0.0, 1.0 / 3.0], [0.0, 1.0 / 3.0, 0.0], [1.0 / 3.0, 0.0, 1.0 / 5.0]],
+        )
+
+        design = np.random.default_rng(0).choice([-1.0, 0.0, 1.0], size=(15, 3))
+        effects = ("intercept", "main", "2-interactions", "quadratic")
+        X = get_X(design, effects=effects)
+        moments = get_moment_matrix(3, effects)
+        expected = np.trace(moments @ np.linalg.inv(X.T @ X))
+
+        efficiency = get_i_efficiency(design, effects=effects)
+        np.testing.assert_allclose(efficiency["Average Variance of Prediction"], expected)
+        np.testing.assert_allclose(efficiency["I-Efficiency (%)"], 100.0 * np.trace(moments) / (15 * expected))
+        self.assertEqual(get_i_efficiency(np.array([[-1.0], [1.0]]), effects=effects)["I-Efficiency (%)"], 0.0)
+
+    def test_robustness_report_matches_refitting_without_lost_runs(self):
+        design = np.random.default_rng(5).choice([-1.0, 0.0, 1.0], size=(9, 3))
+        effects = ("intercept", "main", "quadratic")
+        report = get_robustness_report(design, effects=effects, max_lost=2)
+        self.assertEqual(len(report), 1 + 9 + 36)
+        self.assertEqual(report["Lost Runs"][0], ())
+        self.assertTrue(0 < report["Estimable"].sum() < len(report))
+
+        for _, row in report.iterrows():
+            remaining = np.delete(design, list(row["Lost Runs"]), axis=0)
+            efficiency = get_efficiency(remaining, effects=effects)
+            self.assertEqual(row["Number of Trials"], len(remaining))
+            self.assertEqual(row["Estimable"], efficiency["D-Efficiency (%)"] > 0)
+            np.testing.assert_allclose(row["D-Efficiency (%)"], efficiency["D-Efficiency (%)"], atol=1e-9)
+            np.testing.assert_allclose(row["A-Efficiency (%)"], efficiency["A-Efficiency (%)"], atol=1e-9)
+
+            correlations = np.abs(get_map_of_correlations(remaining, effects=effects, plot=False))
+            np.fill_diagonal(correlations, np.nan)
+            if np.isnan(correlations).all():
+                self.assertTrue(np.isnan(row["Max |Correlation|"]))
+            else:
+                np.testing.assert_allclose(row["Max |Correlation|"], np.nanmax(correlations), atol=1e-9)
+
+    def test_g_efficiency_finds_maximum_variance(self):
+        design = np.array([[-1.0], [0.0], [1.0]])
+        efficiency = get_g_efficiency(design, batch_size=256, n_jobs=2)
+        np.testing.assert_allclose(efficiency["Maximum Variance of Prediction"], 1.0 / 3.0 + 1.0 / 2.0)
+        np.testing.assert_allclose(efficiency["G-Efficiency (%)"], 100.0 * np.sqrt(2.0 / 3.0) / np.sqrt(5.0 / 6.0))
+
+        design = np.random.default_rng(0).choice([-1.0, 0.0, 1.0], size=(12, 3))
+        effects = ("intercept", "main", "quadratic")
+        grid = np.array(np.meshgrid(*[np.linspace(-1.0, 1.0, 21)] * 3)).reshape(3, -1)
+        efficiency = get_g_efficiency(design, effects=effects, batch_size=512, max_points=10**5)
+        self.assertGreaterEqual(
+            efficiency["Maximum Variance of Prediction"], get_variance(grid, design, effects=effects).max() - 1e-9
+        )
+
+        # The rounds of n_jobs batches are truncated to max_points, plus the coordinate search (10 x 3 x 41 points)
+        efficiency = get_g_efficiency(design, effects=effects, batch_size=4096, max_points=3000, n_jobs=8, tol=0.0)
+        self.assertLessEqual(efficiency["Number of Evaluated Points"], 3000 + 10 * 3 * 41)
+
+    def test_term_columns_match_model_matrix(self):
+        design = np.random.default_rng(0).choice([-1.0, 0.0, 1.0], size=(9, 5))
+        X, names = get_X(design, effects=ALL_EFFECTS, return_names=True)
+        terms = [_parse_term(name, 5) for name in names]
+        self.assertEqual(terms, sorted(terms))
+        np.testing.assert_array_equal(_get_term_columns(design, terms), X)
+        for name in ["X0", "X6", "X01", "X2*X1", "X1*X1", "X1^3", "X1*X2^2", "X1*X2*X3*X4", "(2)", ""]:
+            self.assertIsNone(_parse_term(name, 5), name)
+
+    def test_compare_models_matches_leave_one_out_refits(self):
+        rng = np.random.default_rng(0)
+        design = rng.choice([-1.0, 0.0, 1.0], size=(14, 3))
+        X, names = get_X(design, effects=ALL_EFFECTS, return_names=True)
+        Y = np.column_stack([1.0 + design[:, 0] + design[:, 1] * design[:, 2] + rng.normal(size=14) for _ in range(2)])
+        models = [
+            ["(1)", "X1"],
+            ["(1)", "X1", "X2"],
+            ["(1)", "X1", "X2", "X2*X3"],
+            ["X1^2", "(1)", "X3"],
+            ["(1)", "X1", "X1*X2*X3", "X2"],
+        ]
+        comparison = compare_models(design, Y, models, response_names=["a", "b"])
+        self.assertEqual(list(comparison["Model"]), [0, 0, 1, 1, 2, 2, 3, 3, 4, 4])
+
+        for (m, response_nm), row in comparison.set_index(["Model", "Response"]).iterrows():
+            Xm = X[:, sorted(names.index(term) for term in models[m])]
+            y = Y[:, ["a", "b"].index(response_nm)]
+            loo_residuals = [
+                y[i] - Xm[i] @ np.linalg.lstsq(np.delete(Xm, i, axis=0), np.delete(y, i), rcond=None)[0]
+                for i in range(len(y))
+            ]
+            rss = np.sum((y - Xm @ np.linalg.lstsq(Xm, y, rcond=None)[0]) ** 2)
+            n, k = len(y), Xm.shape[1] + 1
+            log_likelihood = -0.5 * n * (np.log(2.0 * np.pi * rss / n) + 1.0)
+            self.assertEqual(row["Rank"], Xm.shape[1])
+            np.testing.assert_allclose(row["PRESS"], np.sum(np.square(loo_residuals)))
+            np.testing.assert_allclose(row["R Squared"], 1.0 - rss / np.sum((y - y.mean()) ** 2))
+            np.testing.assert_allclose(row["AICc"], -2.0 * log_likelihood + 2.0 * k + 2.0 * k * (k + 1) / (n - k - 1))
+            np.testing.assert_allclose(row["BIC"], -2.0 * log_likelihood + k * np.log(n))
+
+        # In a two-level design X1^2 is aliased with the intercept
+        aliased = compare_models(np.array([[-1.0], [1.0]] * 3), Y[:6, 0], [["(1)", "X1", "X1^2"], ["(1)", "X1"]])
+        self.assertEqual(list(aliased["Rank"]), [2, 2])
+        np.testing.assert_allclose(aliased["PRESS"][0], aliased["PRESS"][1])
+        with self.assertRaises(ValueError):
+            compare_models(design, Y, [["(1)", "X4"]])
+
     def test_prediction_variance_rejects_nonestimable_model(self):
         design = np.array([[-1.0], [1.0]])
         points = np.array([[0.0]])
@@ -0,0 +1,104 @@
+import unittest
+
+import numpy as np
+
+from definitive_screening_design.analysis import get_X, get_moment_matrix
+from definitive_screening_design.augmentation import _get_coordinate_terms, _get_kept_columns, augment
+from definitive_screening_design.design import generate
+from definitive_screening_design.response import _code_design
+
+QUADRATIC_EFFECTS = ("intercept", "main", "2-interactions", "quadratic")
+
+
+class TestAugment(unittest.TestCase):
+    def setUp(self):
+        self.A = generate(n_num=6, verbose=False, output="coded")
+
+    def test_coordinate_terms_rebuild_model_matrix(self):
+        x = np.array([0.5, -1.0, 2.0, 0.0])
+        X = get_X(x[np.newaxis], effects=QUADRATIC_EFFECTS + ("3-interactions",))[0]
+        for j, (columns, exponents, others) in enumerate(
+            _get_coordinate_terms(4, QUADRATIC_EFFECTS + ("3-interactions",))
+        ):
+            np.testing.assert_allclose(X[columns], x[j] ** exponents * np.prod(np.append(x, 1.0)[others], axis=1))
+
+    def test_augmented_design_is_locally_optimal(self):
+        for criterion in ["D", "I"]:
+            with self.subTest(criterion=criterion):
+                augmented = augment(self.A, 16, criterion=criterion, n_starts=2, executor=None)
+                self.assertEqual(augmented.shape, (len(self.A) + 16, 6))
+                self.assertEqual(augmented.dtype, np.int8)
+                np.testing.assert_array_equal(augmented[: len(self.A)], self.A)
+                self.assertTrue(np.isin(augmented, [-1.0, 0.0, 1.0]).all())
+
+                def objective(design):
+                    X = get_X(design, effects=QUADRATIC_EFFECTS)
+                    if criterion == "D":
+                        return np.linalg.slogdet(X.T @ X)[1]
+                    return -np.trace(get_moment_matrix(6, QUADRATIC_EFFECTS) @ np.linalg.inv(X.T @ X))
+
+                best = objective(augmented)
+                for i in range(len(self.A), len(augmented)):
+                    for j in range(6):
+                        for level in [-1.0, 0.0, 1.0]:
+                            changed = augmented.copy()
+                            changed[i, j] = level
+                            self.assertLessEqual(objective(changed), best + 1e-9 * abs(best))
+
+    def test_categorical_factors_keep_their_coding_and_no_quadratic_terms(self):
+        A = generate(n_num=4, n_cat=2, verbose=False, output="coded")
+        keep = _get_kept_columns(6, QUADRATIC_EFFECTS, (4, 5))
+        self.assertEqual(len(keep), 26)  # X5^2 and X6^2 are aliased with the intercept
+        for criterion in ["D", "I"]:
+            with self.subTest(criterion=criterion):
+                augmented = augment(A, 20, criterion=criterion, n_starts=2, executor=None)
+                self.assertEqual(augmented.dtype, np.int8)
+                np.testing.assert_array_equal(augmented[: len(A)], A)
+                self.assertTrue(np.isin(augmented[:, :4], [-1.0, 0.0, 1.0]).all())
+                self.assertTrue(np.isin(augmented[:, 4:], [1.0, 2.0]).all())
+                X = get_X(_code_design(augmented), effects=QUADRATIC_EFFECTS)[:, keep]
+                self.assertEqual(np.linalg.matrix_rank(X), 26)
+
+                if criterion == "D":
+                    best = np.linalg.slogdet(X.T @ X)[1]
+                    for i in range(len(A), len(augmented)):
+                        for j in range(4, 6):
+                            changed = augmented.copy()
+                            changed[i, j] = 3.0 - changed[i, j]
+                            X = get_X(_code_design(changed), effects=QUADRATIC_EFFECTS)[:, keep]
+                            self.assertLessEqual(np.linalg.slogdet(X.T @ X)[1], best + 1e-9 * abs(best))
+
+    def test_moment_matrix_of_categorical_factors(self):
+        # Gauss-Legendre quadrature is exact for the polynomial terms of the continuous factor
+        nodes, weights = np.polynomial.legendre.leggauss(5)
+        points = np.array([[x, c] for x in nodes for c in [-1.0, 1.0]])
+        X = get_X(points, effects=QUADRATIC_EFFECTS)
+        expected = X.T @ (X * np.repeat(weights / 4.0, 2)[:, np.newaxis])
+        np.testing.assert_allclose(get_moment_matrix(2, QUADRATIC_EFFECTS, (1,)), expected, atol=1e-14)
+
+    def test_parallel_starts_match_serial_starts(self):
+        serial = augment(self.A, 16, n_starts=3, executor=None)
+        np.testing.assert_array_equal(augment(self.A, 16, n_starts=3, executor="thread", max_workers=2), serial)
+
+    def test_augmented_design_keeps_the_type_of_the_design(self):
+        for dtype in [np.int8, np.int64, np.float32, np.float64]:
+            with self.subTest(dtype=dtype):
+                augmented = augment(self.A.astype(dtype), 16, n_starts=1, executor=None)
+                self.assertEqual(augmented.dtype, dtype)
+        # Levels that the type of the design cannot represent
+        augmented = augment(self.A, 16, levels=[[-1.0, -0.5, 0.0, 0.5, 1.0]] * 6, n_starts=1, executor=None)
+        self.assertEqual(augmented.dtype, np.float64)
+        self.assertTrue(np.isin(augmented[len(self.A) :], [-0.5, 0.5]).any())
+
+    def test_augment_rejects_nonestimable_model(self):
+        with self.assertRaises(ValueError):
+            augment(self.A, 8)
+        with self.assertRaises(ValueError):
+            augment(self.A, 16, criterion="A")
+        with self.assertRaisesRegex(ValueError, "None of the 2 starts"):
+            # x^2 = x on the levels 0 and 1
+            augment(np.zeros((1, 2)), 10, levels=[[0.0, 1.0]] * 2, n_starts=2, executor=None)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from definitive_screening_design._generalized_dsd import _compute_dsd
+from definitive_screening_design import catalog as catalog_module
+from definitive_screening_design.catalog import DesignCatalog, build_catalog
+from definitive_screening_design.design import generate
+from definitive_screening_design.instrumentation import instrument
+
+
+class TestCatalog(unittest.TestCase):
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.path = os.path.join(tmpdir.name, "catalog.bin")
+        self.n_designs = build_catalog(self.path, n_num=range(0, 12), n_cat=range(0, 4))
+
+    def test_catalog_matches_computed_designs(self):
+        catalog = DesignCatalog(self.path)
+        self.assertEqual(len(catalog), self.n_designs)
+        for nctn, ncat, method in catalog.keys():
+            with self.subTest(nctn=nctn, ncat=ncat, method=method):
+                coded = catalog.get(nctn, ncat, method)
+                self.assertEqual(coded.dtype, np.int8)
+                self.assertFalse(coded.flags.writeable)
+                np.testing.assert_array_equal(coded, _compute_dsd(nctn, ncat, method))
+        self.assertIsNone(catalog.get(40, 0, "dsd"))
+
+    def test_generate_from_catalog(self):
+        for kwargs in [dict(n_num=7, n_cat=2, method="orth"), dict(n_num=3), dict(n_num=20)]:
+            with self.subTest(**kwargs):
+                expected = generate(verbose=False, **kwargs)
+                actual = generate(verbose=False, catalog=self.path, **kwargs)
+                self.assertTrue(expected.equals(actual))
+
+    def test_corrupted_design_is_detected(self):
+        catalog = DesignCatalog(self.path)
+        offset = catalog._entries[(5, 1, "dsd")][0]
+        with open(self.path, "r+b") as fh:
+            fh.seek(os.path.getsize(self.path) - catalog._data.size + offset)
+            fh.write(b"\x07")
+
+        catalog = DesignCatalog(self.path)
+        catalog.get(5, 0, "dsd")
+        with self.assertRaisesRegex(ValueError, "Checksum mismatch"):
+            catalog.get(5, 1, "dsd")
+        with self.assertRaisesRegex(ValueError, "Checksum mismatch"):
+            catalog.verify_all()
+
+    def test_catalog_rebuilt_while_open(self):
+        expected = generate(n_num=11, n_cat=3, verbose=False)
+        catalog = DesignCatalog(self.path)
+        self.assertTrue(generate(n_num=11, n_cat=3, verbose=False, catalog=self.path).equals(expected))
+
+        build_catalog(self.path, n_num=range(3, 5), n_cat=range(0, 2))
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), ["catalog.bin"])
+        # The previous file is still mapped, and generate reads the new one
+        np.testing.assert_array_equal(catalog.get(11, 3, "dsd"), _compute_dsd(11, 3, "dsd"))
+        with instrument() as metrics:
+            self.assertTrue(generate(n_num=11, n_cat=3, verbose=False, catalog=self.path).equals(expected))
+            generate(n_num=4, n_cat=1, min_13=False, verbose=False, catalog=self.path)
+        self.assertEqual(metrics.counters["catalog.misses"], 1)
+        self.assertEqual(metrics.counters["catalog.hits"], 1)
+
+    def test_catalog_of_other_constructions_is_rejected(self):
+        with mock.patch.object(catalog_module, "CONSTRUCTION_VERSION", catalog_module.CONSTRUCTION_VERSION - 1):
+            build_catalog(self.path, n_num=range(3, 5), n_cat=range(0, 2))
+        with self.assertRaisesRegex(ValueError, "rebuild it"):
+            DesignCatalog(self.path)
+        with self.assertRaisesRegex(ValueError, "rebuild it"):
+            generate(n_num=3, verbose=False, catalog=self.path)
+
+
+if __name__ == "__main__":
+    unittest.main()
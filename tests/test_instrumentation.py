@@ -0,0 +1,45 @@
+import unittest
+
+from definitive_screening_design import instrumentation
+from definitive_screening_design.analysis import get_efficiency, get_i_efficiency
+from definitive_screening_design.design import clear_design_cache, generate
+from definitive_screening_design.instrumentation import instrument
+
+
+class TestInstrumentation(unittest.TestCase):
+    def test_stages_and_cache_hits_are_recorded(self):
+        clear_design_cache()
+        events = []
+        with instrument(callback=lambda name, elapsed, nbytes: events.append(name)) as metrics:
+            generate(n_num=7, n_cat=2, verbose=False)
+            A = generate(n_num=7, n_cat=2, verbose=False, output="coded")
+            get_efficiency(A)
+            get_i_efficiency(A)
+            get_i_efficiency(A)
+        self.assertFalse(instrumentation.is_enabled())
+
+        stages = metrics.to_dict()["Stages"]
+        for name in ["dsd.prime_search", "dsd.conference_matrix", "dsd.foldover", "dsd.categorical_recode"]:
+            self.assertEqual(stages[name]["Calls"], 1)
+            self.assertLessEqual(stages[name]["Time (s)"], stages["dsd.build"]["Time (s)"])
+        self.assertEqual(stages["generate"]["Calls"], 2)
+        self.assertEqual(stages["generate.dataframe"]["Calls"], 1)
+        self.assertEqual(stages["dsd.build"]["Allocated (bytes)"], A.nbytes)
+        self.assertEqual(stages["analysis.get_i_efficiency"]["Calls"], 2)
+        self.assertEqual(sorted(events), sorted(name for name, stage in stages.items() for _ in range(stage["Calls"])))
+
+        rates = metrics.cache_hit_rates()
+        self.assertEqual(rates["design_cache"], 0.5)
+        self.assertEqual(rates["moment_matrix_cache"], 0.5)
+        self.assertEqual(list(metrics.to_dataframe().columns), ["Calls", "Time (s)", "Allocated (bytes)"])
+
+    def test_nothing_is_recorded_when_disabled(self):
+        with instrument() as metrics:
+            pass
+        generate(n_num=5, verbose=False)
+        self.assertEqual(metrics.to_dict(), {"Stages": {}, "Counters": {}, "Cache Hit Rates": {}})
+        self.assertIs(instrumentation.stage("generate"), instrumentation._NULL_STAGE)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+import unittest
+
+import numpy as np
+
+from definitive_screening_design.analysis import get_X
+from definitive_screening_design.design import generate
+from definitive_screening_design.response import _code_design, _f_isf, _f_sf, fit_definitive_screening, simulate_power
+
+
+def _response(x, rng, noise=1.0):
+    return (
+        20.0
+        + 10.0 * x[:, 0]
+        + 8.0 * x[:, 1]
+        + 6.0 * x[:, 2]
+        + 12.0 * x[:, 1] * x[:, 2]
+        + 9.0 * x[:, 0] ** 2
+        + rng.normal(0.0, noise, len(x))
+    )
+
+
+class TestResponse(unittest.TestCase):
+    def test_f_distribution_survival_function(self):
+        t = np.array([0.0, 0.3, 1.0, 4.0, 50.0])
+        # t distribution with 1 degree of freedom is Cauchy, F with 2 numerator degrees of freedom has closed form
+        np.testing.assert_allclose(_f_sf(t**2, 1, 1), 1.0 - 2.0 / np.pi * np.arctan(t), rtol=1e-10)
+        for df2 in [1.0, 2.5, 7.0, 40.0]:
+            np.testing.assert_allclose(_f_sf(t, 2, df2), (1.0 + 2.0 * t / df2) ** (-df2 / 2.0), rtol=1e-10)
+        self.assertTrue(np.isnan(_f_sf(1.0, 1, 0)))
+        for alpha, df1, df2 in [(0.05, 1, 10), (0.01, 3, 4.5), (0.2, 1, 1)]:
+            np.testing.assert_allclose(_f_sf(_f_isf(alpha, df1, df2), df1, df2), alpha, rtol=1e-9)
+
+    def test_fit_recovers_active_terms(self):
+        rng = np.random.default_rng(0)
+        A = generate(n_num=6, n_fake_factors=2, verbose=False, output="coded")
+        x = _code_design(A)
+        Y = np.column_stack([_response(x, rng) for _ in range(3)])
+
+        fit = fit_definitive_screening(A, Y, response_names=["a", "b", "c"])
+        self.assertEqual(list(fit["Summary"]["Response"]), ["a", "b", "c"])
+        self.assertEqual(list(fit["Summary"]["Active Main Effects"]), [3, 3, 3])
+        coefficients = fit["Coefficients"]
+        for term, value in [("X1", 10.0), ("X2", 8.0), ("X3", 6.0), ("X2*X3", 12.0), ("X1^2", 9.0)]:
+            np.testing.assert_allclose(coefficients.loc[term], value, atol=2.0)
+        self.assertTrue((coefficients.loc[["X4", "X5", "X6", "X4*X5", "X5^2"]] == 0.0).all(axis=None))
+
+        # Each response is fitted independently, and the estimates are the least squares ones of the selected terms
+        single = fit_definitive_screening(A, Y[:, 1])
+        np.testing.assert_allclose(single["Coefficients"]["Y"], coefficients["b"])
+        estimates = single["Parameter Estimates"]
+        X = np.ones((len(x), 1))
+        for term in estimates["Term"][1:]:
+            factors = [int(name[1:]) - 1 for name in term.replace("^2", "").split("*")]
+            column = x[:, factors[0]] ** 2 if term.endswith("^2") else np.prod(x[:, factors], axis=1)
+            X = np.column_stack([X, column])
+        np.testing.assert_allclose(estimates["Estimate"], np.linalg.lstsq(X, Y[:, 1], rcond=None)[0])
+
+    def test_fit_without_fake_factors_and_with_categoricals(self):
+        rng = np.random.default_rng(1)
+        A = generate(n_num=8, n_cat=2, verbose=False, output="coded")
+        x = _code_design(A)
+        y = 20.0 + 10.0 * x[:, 0] + 8.0 * x[:, 8] + 6.0 * x[:, 2] + 12.0 * x[:, 0] * x[:, 2]
+        fit = fit_definitive_screening(A, y + rng.normal(0.0, 1.0, len(x)))
+        self.assertEqual(list(fit["Parameter Estimates"]["Term"]), ["(1)", "X1", "X3", "X9", "X1*X3"])
+        self.assertNotIn("X9^2", fit["Coefficients"].index)
+
+    def test_fit_rejects_design_without_foldover_pairs(self):
+        A = generate(n_num=4, n_cat=2, method="orth", verbose=False, output="coded")
+        with self.assertRaises(ValueError):
+            fit_definitive_screening(A, np.zeros(len(A)))
+
+    def test_simulated_power_matches_replicate_fits(self):
+        A = generate(n_num=6, n_fake_factors=2, verbose=False, output="coded")
+        coefficients = {"(1)": 1.0, "X1": 1.0, "X2": 0.5, "X1*X2": 1.0, "X3^2": 1.0}
+        effects = ("intercept", "main", "quadratic")
+        power = simulate_power(A, coefficients, effects=effects, n_replicates=300, batch_size=128, seed=3)
+        rates = power["Detection Rates"]
+        self.assertEqual(list(rates["Term"][:3]), ["(1)", "X1", "X2"])
+        self.assertEqual(list(rates["Active"][:4]), [True, True, True, False])
+
+        # Same replicates, each fitted separately
+        X = get_X(A, effects=effects)
+        signal = 1.0 + A[:, 0] + 0.5 * A[:, 1] + A[:, 0] * A[:, 1] + A[:, 2] ** 2
+        detected = np.zeros(X.shape[1])
+        for batch, seed in enumerate(np.random.SeedSequence(3).spawn(3)):
+            noise = np.random.default_rng(seed).standard_normal((len(A), [128, 128, 44][batch]))
+            for y in (signal[:, np.newaxis] + noise).T:
+                beta, rss, _, _ = np.linalg.lstsq(X, y, rcond=None)
+                df = len(A) - X.shape[1]
+                t_ratio = beta / np.sqrt(rss[0] / df * np.diag(np.linalg.inv(X.T @ X)))
+                detected += _f_sf(t_ratio**2, 1, df) < 0.05
+        np.testing.assert_allclose(rates["Detection Rate"], detected / 300)
+
+    def test_simulated_power_of_two_stage_selection(self):
+        A = generate(n_num=6, n_fake_factors=2, verbose=False, output="coded")
+        power = simulate_power(A, {"X1": 3.0, "X2": 3.0, "X1*X2": 3.0}, selection="two-stage", n_replicates=200)
+        rates = power["Detection Rates"].set_index("Term")["Detection Rate"]
+        self.assertGreater(rates[["X1", "X2", "X1*X2"]].min(), 0.9)
+        self.assertLess(rates[["X3", "X4", "X5", "X6"]].max(), 0.2)
+        self.assertGreater(power["Exact Selection Rate"], 0.5)
+        with self.assertRaises(ValueError):
+            simulate_power(A, {"X1^3": 1.0})
+
+
+if __name__ == "__main__":
+    unittest.main()
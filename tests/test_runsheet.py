@@ -0,0 +1,59 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from definitive_screening_design.design import generate
+from definitive_screening_design.runsheet import RunSheet, load_run_sheet
+
+FACTORS = {"Temperature": (30, 90), "Solvent": ("A", "B"), "Pressure": (1.5, 2.5), "Stirred": (False, True)}
+
+
+class TestRunSheet(unittest.TestCase):
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.path = os.path.join(tmpdir.name, "run_sheet.dsd")
+
+    def test_saved_run_sheet_matches_generate(self):
+        for method in ["dsd", "orth"]:
+            with self.subTest(method=method):
+                run_sheet = generate(factors_dict=FACTORS, method=method, verbose=False, output="run_sheet")
+                n_bytes = run_sheet.save(self.path)
+                self.assertEqual(os.path.getsize(self.path), n_bytes)
+
+                loaded = load_run_sheet(self.path)
+                self.assertIsInstance(loaded.coded.base, np.memmap)
+                self.assertEqual(loaded.coded.dtype, np.int8)
+                self.assertFalse(loaded.coded.flags.writeable)
+                self.assertEqual(loaded.factors_dict, FACTORS)
+                self.assertEqual(list(loaded.factors_dict), list(FACTORS))
+                self.assertEqual(loaded.method, method)
+                for output in ["coded", "codes"]:
+                    expected = generate(factors_dict=FACTORS, method=method, verbose=False, output=output)
+                    np.testing.assert_array_equal(loaded.as_output(output), expected)
+                expected = generate(factors_dict=FACTORS, method=method, verbose=False, output="structured")
+                self.assertEqual(loaded.as_output("structured").tolist(), expected.tolist())
+                expected = generate(factors_dict=FACTORS, method=method, verbose=False)
+                self.assertTrue(loaded.as_output("dataframe").equals(expected))
+
+    def test_invalid_run_sheets_are_rejected(self):
+        coded = generate(factors_dict=FACTORS, verbose=False, output="coded")
+        with self.assertRaises(ValueError):
+            RunSheet(coded[:, ::-1], FACTORS)  # categorical columns swapped with numerical ones
+        with self.assertRaises(ValueError):
+            RunSheet(coded, FACTORS, method="random")
+
+        RunSheet(coded, FACTORS).save(self.path)
+        with open(self.path, "r+b") as fh:
+            fh.seek(-1, os.SEEK_END)
+            fh.write(b"\x07")
+        with self.assertRaisesRegex(ValueError, "Checksum mismatch"):
+            load_run_sheet(self.path)
+        with self.assertRaisesRegex(ValueError, "not a run sheet"):
+            load_run_sheet(__file__)
+
+
+if __name__ == "__main__":
+    unittest.main()